@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Оповещения о пересечении порогов RUONIA и спреда и об изменении ключевой ставки"""
+
+import re
+import time
+import storage
+
+# Сколько оповещений может завести один чат
+MAX_ALERTS_PER_CHAT = 20
+
+# Виды оповещений с порогом
+RUONIA_ABOVE = 'ruonia_above'
+RUONIA_BELOW = 'ruonia_below'
+SPREAD_CROSS = 'spread_cross'
+KEY_RATE_CHANGE = 'key_rate'
+
+NUMBER = r'([+-]?\d+(?:[.,]\d+)?)'
+# "ruonia > 16.5", "руониа<15"
+RUONIA_ARGUMENT = re.compile(r'^(?:ruonia|руониа|руония)\s*([<>])\s*' + NUMBER + r'%?$')
+# "spread -0.25", "спред 0,1"
+SPREAD_ARGUMENT = re.compile(r'^(?:spread|спред)\s*' + NUMBER + r'%?$')
+KEY_RATE_ARGUMENT = re.compile(r'^(?:key|ключевая|ставка)$')
+# "off 3", "удалить 3"
+REMOVE_ARGUMENT = re.compile(r'^(?:off|удалить)\s+#?(\d+)$')
+CLEAR_ARGUMENT = re.compile(r'^(?:clear|очистить)$')
+
+HELP_TEXT = (
+    "Оповещения:\n"
+    "/alert ruonia > 16.5 — RUONIA поднялась выше 16,5%\n"
+    "/alert ruonia < 15 — RUONIA опустилась ниже 15%\n"
+    "/alert spread -0.25 — спред RUONIA к ключевой ставке пересек -0,25 п.п.\n"
+    "/alert key — ключевая ставка изменилась\n"
+    "/alert off 3 — удалить оповещение №3, /alert clear — удалить все"
+)
+
+
+def _number(value):
+    return float(value.replace(',', '.'))
+
+
+def describe(kind, threshold):
+    """Условие оповещения словами"""
+    if kind == RUONIA_ABOVE:
+        return f"RUONIA выше {threshold:.2f}%"
+    if kind == RUONIA_BELOW:
+        return f"RUONIA ниже {threshold:.2f}%"
+    if kind == SPREAD_CROSS:
+        return f"спред пересекает {threshold:+.2f} п.п."
+    return "изменение ключевой ставки"
+
+
+class AlertStore:
+    """Оповещения чатов и последние учтенные значения рядов
+
+    Пороги хранятся в индексе (kind, threshold), поэтому новое значение
+    выбирает диапазоном только пересеченные им оповещения, не перебирая
+    остальные.
+    """
+
+    def __init__(self, conn=None):
+        self.conn = conn or storage.connect()
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS alerts ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, chat_id INTEGER NOT NULL, kind TEXT NOT NULL, '
+            'threshold REAL, created_at REAL NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS alerts_by_threshold ON alerts (kind, threshold)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS alerts_by_chat ON alerts (chat_id)')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS alert_values ('
+            'series TEXT PRIMARY KEY, value REAL NOT NULL, updated_at REAL NOT NULL)'
+        )
+        self.conn.commit()
+
+    def add(self, chat_id, kind, threshold=None):
+        """Новое оповещение; его номер или None, если такое уже есть или превышен лимит"""
+        rows = self.for_chat(chat_id)
+        if (kind, threshold) in {(row_kind, row_threshold) for _, row_kind, row_threshold in rows}:
+            return None
+        if len(rows) >= MAX_ALERTS_PER_CHAT:
+            return None
+        with self.conn:
+            cursor = self.conn.execute(
+                'INSERT INTO alerts (chat_id, kind, threshold, created_at) VALUES (?, ?, ?, ?)',
+                (chat_id, kind, threshold, time.time())
+            )
+        return cursor.lastrowid
+
+    def remove(self, chat_id, alert_id):
+        with self.conn:
+            cursor = self.conn.execute('DELETE FROM alerts WHERE id = ? AND chat_id = ?', (alert_id, chat_id))
+        return cursor.rowcount > 0
+
+    def clear(self, chat_id):
+        with self.conn:
+            cursor = self.conn.execute('DELETE FROM alerts WHERE chat_id = ?', (chat_id,))
+        return cursor.rowcount
+
+    def for_chat(self, chat_id):
+        """Оповещения чата: список (номер, вид, порог)"""
+        return self.conn.execute(
+            'SELECT id, kind, threshold FROM alerts WHERE chat_id = ? ORDER BY id', (chat_id,)
+        ).fetchall()
+
+    def has_alerts(self):
+        return self.conn.execute('SELECT 1 FROM alerts LIMIT 1').fetchone() is not None
+
+    def crossed(self, kind, low, high, include_low):
+        """Оповещения вида kind с порогом в [low, high) или (low, high]: список (chat_id, порог)"""
+        condition = 'threshold >= ? AND threshold < ?' if include_low else 'threshold > ? AND threshold <= ?'
+        return self.conn.execute(
+            f'SELECT chat_id, threshold FROM alerts WHERE kind = ? AND {condition} ORDER BY threshold',
+            (kind, low, high)
+        ).fetchall()
+
+    def chats(self, kind):
+        return [row[0] for row in self.conn.execute('SELECT DISTINCT chat_id FROM alerts WHERE kind = ?', (kind,))]
+
+    def last_value(self, series):
+        row = self.conn.execute('SELECT value FROM alert_values WHERE series = ?', (series,)).fetchone()
+        return row[0] if row else None
+
+    def set_value(self, series, value):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO alert_values (series, value, updated_at) VALUES (?, ?, ?)',
+            (series, value, time.time())
+        )
+
+    def close(self):
+        self.conn.close()
+
+
+def alert_command(store, chat_id, argument):
+    """Ответ на /alert с аргументом argument (строка в нижнем регистре или None)"""
+    if not argument:
+        rows = store.for_chat(chat_id)
+        if not rows:
+            return "У вас нет оповещений.\n\n" + HELP_TEXT
+        lines = [f"#{alert_id}: {describe(kind, threshold)}" for alert_id, kind, threshold in rows]
+        return "🔔 Ваши оповещения:\n" + "\n".join(lines) + "\n\nУдалить: /alert off <номер>"
+
+    match = REMOVE_ARGUMENT.match(argument)
+    if match:
+        if store.remove(chat_id, int(match.group(1))):
+            return f"Оповещение #{match.group(1)} удалено."
+        return f"Оповещения #{match.group(1)} нет."
+    if CLEAR_ARGUMENT.match(argument):
+        return f"Удалено оповещений: {store.clear(chat_id)}."
+
+    match = RUONIA_ARGUMENT.match(argument)
+    if match:
+        kind, threshold, series = RUONIA_ABOVE if match.group(1) == '>' else RUONIA_BELOW, _number(match.group(2)), 'ruonia'
+    elif SPREAD_ARGUMENT.match(argument):
+        kind, threshold, series = SPREAD_CROSS, _number(SPREAD_ARGUMENT.match(argument).group(1)), 'spread'
+    elif KEY_RATE_ARGUMENT.match(argument):
+        kind, threshold, series = KEY_RATE_CHANGE, None, 'key_rate'
+    else:
+        return "Не удалось разобрать условие.\n\n" + HELP_TEXT
+
+    alert_id = store.add(chat_id, kind, threshold)
+    if alert_id is None:
+        return f"Такое оповещение уже есть или их больше {MAX_ALERTS_PER_CHAT}. Список: /alert"
+
+    text = f"✅ Оповещение #{alert_id}: {describe(kind, threshold)}"
+    current = store.last_value(series)
+    if current is not None:
+        text += f"\nСейчас: {current:+.2f} п.п." if series == 'spread' else f"\nСейчас: {current:.2f}%"
+    return text
+
+
+def _crossings(store, series, value):
+    """Сработавшие оповещения при переходе ряда series к значению value: список (chat_id, текст)"""
+    previous = store.last_value(series)
+    store.set_value(series, value)
+    if previous is None or previous == value:
+        return []
+
+    fired = []
+    if series == 'ruonia':
+        # Выше X: было не выше X, стало выше — порог в [было, стало)
+        for chat_id, threshold in store.crossed(RUONIA_ABOVE, previous, value, include_low=True):
+            fired.append((chat_id, f"📈 RUONIA выше {threshold:.2f}%: {value:.2f}% (было {previous:.2f}%)"))
+        # Ниже X: было не ниже X, стало ниже — порог в (стало, было]
+        for chat_id, threshold in store.crossed(RUONIA_BELOW, value, previous, include_low=False):
+            fired.append((chat_id, f"📉 RUONIA ниже {threshold:.2f}%: {value:.2f}% (было {previous:.2f}%)"))
+    elif series == 'spread':
+        low, high = min(previous, value), max(previous, value)
+        for chat_id, threshold in store.crossed(SPREAD_CROSS, low, high, include_low=False):
+            fired.append((chat_id, f"↕️ Спред RUONIA к ключевой ставке пересек {threshold:+.2f} п.п.: "
+                                   f"{value:+.2f} п.п. (было {previous:+.2f})"))
+    else:
+        for chat_id in store.chats(KEY_RATE_CHANGE):
+            fired.append((chat_id, f"🏦 Ключевая ставка изменилась: {previous:.2f}% → {value:.2f}%"))
+    return fired
+
+
+def ingest(report_data):
+    """Учет свежих значений из собранных данных; сообщения сработавших оповещений [(chat_id, текст)]
+
+    Значения сравниваются с последними учтенными, поэтому каждое
+    пересечение срабатывает один раз, в каком бы запуске его ни заметили.
+    Оповещения одного чата объединяются в одно сообщение.
+    """
+    values = {'ruonia': report_data.ruonia, 'key_rate': report_data.key_rate}
+    if report_data.ruonia and report_data.key_rate:
+        values['spread'] = round(report_data.ruonia - report_data.key_rate, 4)
+
+    store = AlertStore()
+    try:
+        fired = []
+        with store.conn:
+            for series, value in values.items():
+                if value:
+                    fired.extend(_crossings(store, series, value))
+    finally:
+        store.close()
+
+    texts = {}
+    for chat_id, text in fired:
+        texts.setdefault(chat_id, []).append(text)
+    return [(chat_id, "🔔 Оповещение\n\n" + "\n".join(lines)) for chat_id, lines in texts.items()]
+
+
+def has_alerts():
+    store = AlertStore()
+    try:
+        return store.has_alerts()
+    finally:
+        store.close()
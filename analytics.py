@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Векторная статистика спреда RUONIA к ключевой ставке на NumPy"""
+
+import numpy as np
+
+# Окна статистики в календарных днях: месяц, квартал, год, пять лет
+WINDOWS = (30, 90, 365, 365 * 5)
+# Окно скользящего среднего в торговых днях
+ROLLING_DAYS = 20
+# Окно считается покрытым, если история начинается не позже чем через столько дней после его начала
+COVERAGE_SLACK_DAYS = 7
+
+
+class SpreadSeries:
+    """Дни (порядковые номера дат) и спред RUONIA к ключевой ставке в процентах, по возрастанию дат"""
+
+    def __init__(self, days, spreads):
+        self.days = days
+        self.spreads = spreads
+
+    def __len__(self):
+        return len(self.days)
+
+    def since(self, first_day):
+        """Срез (без копирования) начиная с дня first_day"""
+        start = np.searchsorted(self.days, first_day, side='left')
+        return SpreadSeries(self.days[start:], self.spreads[start:])
+
+
+class SpreadStats:
+    """Статистика спреда за окно"""
+
+    def __init__(self, window_days, count, mean, median, std, p10, p90, minimum, maximum, trend):
+        self.window_days = window_days
+        self.count = count
+        self.mean = mean
+        self.median = median
+        self.std = std
+        self.p10 = p10
+        self.p90 = p90
+        self.minimum = minimum
+        self.maximum = maximum
+        self.trend = trend
+
+
+def build_spread_series(ruonia_series, key_rate_index):
+    """Спред к ставке, действовавшей в каждый день, из ряда RUONIA и индекса ключевой ставки"""
+    days = ruonia_series.days
+    ruonia = ruonia_series.rates
+
+    # Ставка в каждый день — слиянием отсортированных дней с точками изменения
+    change_days = np.fromiter((date.toordinal() for date in key_rate_index.dates), dtype=np.int32, count=len(key_rate_index))
+    change_rates = np.asarray(key_rate_index.rates, dtype=np.float64)
+    positions = np.searchsorted(change_days, days, side='right') - 1
+    known = positions >= 0
+
+    return SpreadSeries(days[known], ruonia[known] - change_rates[positions[known]])
+
+
+def rolling_mean(values, window=ROLLING_DAYS):
+    """Скользящее среднее по window значениям через накопленные суммы"""
+    if len(values) < window:
+        return np.empty(0)
+    cumsum = np.cumsum(np.concatenate(([0.0], values)))
+    return (cumsum[window:] - cumsum[:-window]) / window
+
+
+def window_stats(series, window_days, end_day):
+    """Статистика спреда за последние window_days календарных дней до end_day"""
+    window = series.since(end_day - window_days)
+    if len(window) == 0:
+        return None
+
+    spreads = window.spreads
+    p10, median, p90 = np.percentile(spreads, (10, 50, 90))
+    # Тренд — наклон линейной регрессии, в процентных пунктах за 30 дней
+    trend = np.polyfit(window.days - window.days[0], spreads, 1)[0] * 30 if len(window) > 1 else 0.0
+
+    return SpreadStats(
+        window_days, len(window), float(spreads.mean()), float(median), float(spreads.std()),
+        float(p10), float(p90), float(spreads.min()), float(spreads.max()), float(trend)
+    )
+
+
+def compute_spread_stats(series, end_day, windows=WINDOWS):
+    """Статистика по всем окнам, полностью покрытым историей"""
+    if len(series) == 0:
+        return []
+
+    stats = []
+    for window_days in windows:
+        if series.days[0] > end_day - window_days + COVERAGE_SLACK_DAYS:
+            continue
+        result = window_stats(series, window_days, end_day)
+        if result:
+            stats.append(result)
+    return stats
+
+
+def render_spread_stats(series, stats):
+    """Текстовый блок статистики для сообщений"""
+    if not stats:
+        return ""
+
+    lines = ["📐 Спред RUONIA к ключевой ставке:"]
+    for item in stats:
+        lines.append(
+            f"• {item.window_days} дн. ({item.count} торг. дн.): среднее {item.mean:+.2f}%, "
+            f"медиана {item.median:+.2f}%, σ {item.std:.2f}%"
+        )
+        lines.append(
+            f"  P10…P90: {item.p10:+.2f}…{item.p90:+.2f}%, мин/макс: {item.minimum:+.2f}/{item.maximum:+.2f}%, "
+            f"тренд: {item.trend:+.2f}% за 30 дн."
+        )
+
+    rolling = rolling_mean(series.spreads)
+    if len(rolling):
+        lines.append(f"〰️ Скользящее среднее за {ROLLING_DAYS} торг. дн.: {rolling[-1]:+.2f}%")
+    return "\n".join(lines)
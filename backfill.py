@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Загрузка многолетней истории RUONIA параллельными частями с продолжением после сбоя"""
+
+import os
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+from cbr_data import fetch_page, parse_rate_table, ruonia_history_url, key_rate_history_url
+from history_store import RuoniaHistoryStore
+from key_rate_index import KeyRateStore
+from http_client import close_async_client
+from trading_calendar import start_of_day
+
+# Число одновременно загружаемых частей
+BACKFILL_CONCURRENCY = int(os.getenv('BACKFILL_CONCURRENCY', '4'))
+# Длина части в месяцах
+CHUNK_MONTHS = {'month': 1, 'quarter': 3}
+
+
+def _add_months(date, months):
+    """Первое число месяца через months месяцев после месяца даты date"""
+    month = date.month - 1 + months
+    return datetime(date.year + month // 12, month % 12 + 1, 1)
+
+
+def split_period(start_date, end_date, chunk='month'):
+    """Разбиение периода на части по календарным месяцам или кварталам: список (начало, конец)"""
+    months = CHUNK_MONTHS[chunk]
+    chunks = []
+    chunk_start = start_of_day(start_date)
+    end_date = start_of_day(end_date)
+    while chunk_start <= end_date:
+        # Границы выравниваются по началу месяца (квартала), чтобы части совпадали между запусками
+        boundary = datetime(chunk_start.year, (chunk_start.month - 1) // months * months + 1, 1)
+        chunk_end = min(_add_months(boundary, months) - timedelta(days=1), end_date)
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = chunk_end + timedelta(days=1)
+    return chunks
+
+
+class BackfillJournal:
+    """Состояние частей загрузки в локальной базе для продолжения с места остановки"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS backfill_chunks ('
+            'start TEXT NOT NULL, end TEXT NOT NULL, status TEXT NOT NULL, '
+            'rows INTEGER NOT NULL DEFAULT 0, updated_at TEXT NOT NULL, '
+            'PRIMARY KEY (start, end))'
+        )
+        self.conn.commit()
+
+    def completed(self):
+        """Множество уже загруженных частей"""
+        rows = self.conn.execute("SELECT start, end FROM backfill_chunks WHERE status = 'done'").fetchall()
+        return {(datetime.strptime(start, '%Y-%m-%d'), datetime.strptime(end, '%Y-%m-%d')) for start, end in rows}
+
+    def mark(self, chunk, status, rows=0):
+        start, end = chunk
+        self.conn.execute(
+            'INSERT OR REPLACE INTO backfill_chunks (start, end, status, rows, updated_at) VALUES (?, ?, ?, ?, ?)',
+            (start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'), status, rows, datetime.now().isoformat(timespec='seconds'))
+        )
+        self.conn.commit()
+
+
+async def _load_chunk(chunk, store, journal, semaphore):
+    """Загрузка одной части; повторы запроса выполняются внутри fetch_page независимо от других частей"""
+    start, end = chunk
+    # Страницы частей нужны один раз: в кэш HTTP они не сохраняются, чтобы не раздувать базу
+    async with semaphore:
+        content = await fetch_page(ruonia_history_url(start, end), f"истории RUONIA за {start.strftime('%m.%Y')}",
+                                   use_cache=False)
+
+    if content is None:
+        journal.mark(chunk, 'failed')
+        print(f"❌ Часть {start.strftime('%d.%m.%Y')}-{end.strftime('%d.%m.%Y')} не загружена")
+        return False
+
+    history = parse_rate_table(content)
+    if history:
+        store.add(history)
+    journal.mark(chunk, 'done', len(history))
+    print(f"📊 {start.strftime('%d.%m.%Y')}-{end.strftime('%d.%m.%Y')}: {len(history)} записей")
+    return True
+
+
+async def _load_key_rate_chunk(chunk, semaphore):
+    """Ключевая ставка по дням за одну часть; None, если часть не загружена"""
+    start, end = chunk
+    async with semaphore:
+        content = await fetch_page(key_rate_history_url(start, end), f"ключевой ставки за {start.strftime('%m.%Y')}",
+                                   use_cache=False)
+
+    if content is None:
+        print(f"❌ Ключевая ставка за {start.strftime('%d.%m.%Y')}-{end.strftime('%d.%m.%Y')} не загружена")
+        return None
+    return parse_rate_table(content)
+
+
+async def _load_key_rate(start_date, end_date, chunk, semaphore, key_rates):
+    """Загрузка ключевой ставки за период теми же частями; False, если не загружена хотя бы одна часть"""
+    results = await asyncio.gather(*(_load_key_rate_chunk(item, semaphore) for item in split_period(start_date, end_date, chunk)))
+    if any(rows is None for rows in results):
+        return False
+
+    rows = [entry for part in results for entry in part]
+    if rows:
+        key_rates.add_changes(rows)
+        key_rates.extend_coverage(start_of_day(start_date), max(entry['date'] for entry in rows))
+    return True
+
+
+async def backfill(start_date, end_date, chunk='month', concurrency=BACKFILL_CONCURRENCY):
+    """Загрузка истории RUONIA за период в локальное хранилище; True, если загружены все части"""
+    store = RuoniaHistoryStore()
+    try:
+        journal = BackfillJournal(store.conn)
+        completed = journal.completed()
+        chunks = split_period(start_date, end_date, chunk)
+        pending = [item for item in chunks if item not in completed]
+        print(f"🗂 Частей: {len(chunks)}, уже загружено: {len(chunks) - len(pending)}")
+
+        semaphore = asyncio.Semaphore(concurrency)
+        results = await asyncio.gather(*(_load_chunk(item, store, journal, semaphore) for item in pending))
+        if not all(results):
+            print(f"⚠️ Не загружено частей: {results.count(False)}. Повторный запуск продолжит с них")
+            return False
+
+        # Загружен весь период: дальнейшая синхронизация догружает только новые дни.
+        # Покрытие расширяется, только если между периодом и уже загруженной историей нет разрыва
+        covered_from = store.covered_from()
+        if covered_from is None or start_of_day(start_date) < covered_from <= start_of_day(end_date) + timedelta(days=1):
+            store.extend_coverage(start_of_day(start_date))
+
+        # Ключевая ставка за тот же период для расчета спреда
+        if not await _load_key_rate(start_date, end_date, chunk, semaphore, KeyRateStore(store.conn)):
+            print("⚠️ Ключевая ставка загружена не полностью. Повторный запуск загрузит ее заново")
+            return False
+        print(f"✅ История загружена: {store.series()!r}")
+        return True
+    finally:
+        store.conn.close()
+
+
+async def main(start_date, end_date, chunk, concurrency):
+    try:
+        return await backfill(start_date, end_date, chunk, concurrency)
+    finally:
+        await close_async_client()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Загрузка истории RUONIA в локальную базу')
+    parser.add_argument('--from', dest='start', required=True, help='начало периода, ГГГГ-ММ-ДД')
+    parser.add_argument('--to', dest='end', help='конец периода, ГГГГ-ММ-ДД (по умолчанию сегодня)')
+    parser.add_argument('--chunk', choices=sorted(CHUNK_MONTHS), default='month', help='размер части')
+    parser.add_argument('--concurrency', type=int, default=BACKFILL_CONCURRENCY, help='число одновременных запросов')
+    args = parser.parse_args()
+
+    start = datetime.strptime(args.start, '%Y-%m-%d')
+    end = datetime.strptime(args.end, '%Y-%m-%d') if args.end else datetime.now()
+    ok = asyncio.run(main(start, end, args.chunk, args.concurrency))
+    exit(0 if ok else 1)
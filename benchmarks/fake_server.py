@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Локальный стенд сайта ЦБ и Bot API на записанных страницах
+
+Страницы ЦБ отдаются из benchmarks/fixtures с ETag, как на настоящем
+сайте, таблицы — только со строками за запрошенный период, ответы веб-сервиса DailyInfoWebServ — из записанных XML за
+запрошенный период; Bot API отвечает на getUpdates очередью обновлений, а после
+setWebhook сам отправляет обновления POST-запросом на адрес вебхука,
+и запоминает отправленные сообщения. Для ручной проверки бота стенд можно запустить
+отдельно и указать CBR_BASE_URL и TELEGRAM_API_URL на него.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import argparse
+import threading
+import urllib.request
+from urllib.error import HTTPError
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+BOT_METHOD = re.compile(r'^/bot[^/]+/(\w+)$')
+
+DAILY_INFO_PATH = '/DailyInfoWebServ/DailyInfo.asmx'
+# Записанный ответ для метода веб-сервиса из заголовка SOAPAction
+DAILY_INFO_FIXTURES = {
+    'RuoniaXML': 'dailyinfo_ruonia',
+    'KeyRateXML': 'dailyinfo_key_rate',
+}
+# Границы периода в теле запроса и дата записи в строке ответа
+SOAP_PERIOD = re.compile(r'<fromDate>(\d{4}-\d{2}-\d{2})[^<]*</fromDate>\s*<ToDate>(\d{4}-\d{2}-\d{2})')
+RECORD_DATE = re.compile(r'<(?:D0|DT)>(\d{4}-\d{2}-\d{2})')
+# Строка таблицы на странице сайта с датой в первой ячейке
+TABLE_ROW = re.compile(r'[ \t]*<tr>\s*<td>(\d{2}\.\d{2}\.\d{4})</td>.*?</tr>\n?', re.S)
+
+
+def _filter_period(body, request_body):
+    """Записи ответа веб-сервиса только за запрошенный период (по одной на строку)"""
+    period = SOAP_PERIOD.search(request_body)
+    if not period:
+        return body
+    start, end = period.groups()
+    lines = []
+    for line in body.decode('utf-8').splitlines(keepends=True):
+        record = RECORD_DATE.search(line)
+        if record is None or start <= record.group(1) <= end:
+            lines.append(line)
+    return ''.join(lines).encode('utf-8')
+
+
+def _period(query):
+    """Запрошенный период UniDbQuery.From-To: (начало, конец) или None"""
+    try:
+        return (datetime.strptime(query['UniDbQuery.From'][0], '%d.%m.%Y'),
+                datetime.strptime(query['UniDbQuery.To'][0], '%d.%m.%Y'))
+    except (KeyError, ValueError):
+        return None
+
+
+def _filter_rows(body, query):
+    """Строки таблицы страницы только за запрошенный период, как их отдает сайт"""
+    period = _period(query)
+    if period is None:
+        return body
+    start, end = period
+
+    def keep(match):
+        return match.group(0) if start <= datetime.strptime(match.group(1), '%d.%m.%Y') <= end else ''
+
+    return TABLE_ROW.sub(keep, body.decode('utf-8')).encode('utf-8')
+
+
+class FakeServer:
+    """Стенд в фоновом потоке; base_url — адрес и для CBR_BASE_URL, и для TELEGRAM_API_URL"""
+
+    def __init__(self, host='127.0.0.1', port=0, fixtures_dir=FIXTURES_DIR):
+        self.fixtures = {}
+        for name in os.listdir(fixtures_dir):
+            with open(os.path.join(fixtures_dir, name), 'rb') as f:
+                body = f.read()
+            self.fixtures[os.path.splitext(name)[0]] = body
+
+        self.updates = []
+        self.sent = []
+        self.webhook = None
+        self.hits = {}
+        # Пути, на которые стенд отвечает 500, как отказавший сервис
+        self.failing = set()
+        self._next_update_id = 1
+        self._next_message_id = 1
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def push_update(self, text, chat_id=1):
+        """Сообщение пользователя: в очередь getUpdates или, если задан вебхук, POST-запросом на него"""
+        with self._lock:
+            update_id = self._next_update_id
+            self._next_update_id += 1
+            update = {
+                'update_id': update_id,
+                'message': {
+                    'message_id': update_id,
+                    'date': int(time.time()),
+                    'chat': {'id': chat_id, 'type': 'private'},
+                    'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Bench'},
+                    'text': text,
+                },
+            }
+            if text.startswith('/'):
+                # Как у настоящего Bot API: команда размечена, по разметке ее находят обработчики PTB
+                command = text.split()[0]
+                update['message']['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(command)}]
+            webhook = self.webhook
+            if webhook is None:
+                self.updates.append(update)
+
+        if webhook is not None:
+            self.post_update(update, *webhook)
+        return update_id
+
+    @staticmethod
+    def post_update(update, url, secret_token=None):
+        """Доставка обновления на вебхук, как это делает Telegram; код ответа HTTP"""
+        request = urllib.request.Request(
+            url, data=json.dumps(update).encode('utf-8'), method='POST',
+            headers={'Content-Type': 'application/json'}
+        )
+        if secret_token:
+            request.add_header('X-Telegram-Bot-Api-Secret-Token', secret_token)
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return response.status
+        except HTTPError as e:
+            return e.code
+
+    def _fixture_for(self, path, query):
+        if path.startswith('/key-indicators'):
+            return 'key_indicators'
+        if path.startswith('/hd_base/ruonia/dynamics'):
+            # Без периода сайт показывает последний месяц
+            return 'ruonia_long' if _period(query) else 'ruonia_short'
+        if path.startswith('/hd_base/KeyRate'):
+            return 'key_rate'
+        if path.startswith('/DKP/cal_mp'):
+            return 'cal_mp'
+        return None
+
+    def _bot_method(self, method, params):
+        with self._lock:
+            if method == 'getUpdates':
+                offset = int(params.get('offset') or 0)
+                self.updates = [update for update in self.updates if update['update_id'] >= offset]
+                limit = int(params.get('limit') or 100)
+                return True, self.updates[:limit]
+            if method == 'sendMessage':
+                message_id = self._next_message_id
+                self._next_message_id += 1
+                chat_id = int(params.get('chat_id'))
+                self.sent.append((chat_id, params.get('text')))
+                return True, {
+                    'message_id': message_id,
+                    'date': int(time.time()),
+                    'chat': {'id': chat_id, 'type': 'private'},
+                    'text': params.get('text'),
+                }
+            if method == 'setWebhook':
+                self.webhook = (params['url'], params.get('secret_token')) if params.get('url') else None
+                return True, True
+            if method == 'deleteWebhook':
+                self.webhook = None
+                return True, True
+            if method == 'getMe':
+                return True, {'id': 1, 'is_bot': True, 'first_name': 'RUONIA', 'username': 'ruonia_bench_bot'}
+        return False, f'Not Found: method {method}'
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _send(self, status, body=b'', headers=()):
+                self.send_response(status)
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _params(self):
+                parts = urlsplit(self.path)
+                params = {key: values[0] for key, values in parse_qs(parts.query).items()}
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length).decode('utf-8') if length else ''
+                content_type = self.headers.get('Content-Type', '')
+                if content_type.startswith('application/json'):
+                    params.update(json.loads(body))
+                elif body and not content_type.startswith('text/xml'):
+                    params.update({key: values[0] for key, values in parse_qs(body).items()})
+                return parts.path, params, body
+
+            def _send_fixture(self, body, content_type):
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()
+                if self.headers.get('If-None-Match') == etag:
+                    self._send(304, headers=[('ETag', etag)])
+                    return
+                self._send(200, body, [('Content-Type', content_type), ('ETag', etag)])
+
+            def _handle(self):
+                path, params, request_body = self._params()
+                with server._lock:
+                    server.hits[path] = server.hits.get(path, 0) + 1
+                if path in server.failing:
+                    self._send(500)
+                    return
+
+                match = BOT_METHOD.match(path)
+                if match:
+                    ok, result = server._bot_method(match.group(1), params)
+                    payload = {'ok': True, 'result': result} if ok else {'ok': False, 'error_code': 404, 'description': result}
+                    self._send(200 if ok else 404, json.dumps(payload).encode('utf-8'),
+                               [('Content-Type', 'application/json')])
+                    return
+
+                if path == DAILY_INFO_PATH:
+                    action = self.headers.get('SOAPAction', '').strip('"').rsplit('/', 1)[-1]
+                    name = DAILY_INFO_FIXTURES.get(action)
+                    if name is None or name not in server.fixtures:
+                        self._send(500)
+                        return
+                    body = _filter_period(server.fixtures[name], request_body)
+                    self._send_fixture(body, 'text/xml; charset=utf-8')
+                    return
+
+                query = parse_qs(urlsplit(self.path).query)
+                name = server._fixture_for(path, query)
+                if name is None or name not in server.fixtures:
+                    self._send(404)
+                    return
+                self._send_fixture(_filter_rows(server.fixtures[name], query), 'text/html; charset=utf-8')
+
+            do_GET = _handle
+            do_POST = _handle
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Локальный стенд сайта ЦБ и Bot API')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    fake = FakeServer(port=args.port).start()
+    print(f"CBR_BASE_URL={fake.base_url} TELEGRAM_API_URL={fake.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        fake.stop()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Перезапись страниц и ответов веб-сервиса в benchmarks/fixtures с сайта ЦБ
+
+После перезаписи базовые результаты нужно сохранить заново:
+python benchmarks/run.py --save-baseline
+"""
+
+import os
+import re
+import sys
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from cbr_data import (KEY_INDICATORS_URL, KEY_RATE_URL, MEETINGS_URL, RUONIA_URL, DAILY_INFO_URL, DAILY_INFO_NAMESPACE,
+                      SOAP_ENVELOPE, ruonia_history_url)
+import httpx
+from http_client import HEADERS
+from fake_server import FIXTURES_DIR, DAILY_INFO_FIXTURES
+
+# Начало записи в ответах веб-сервиса: стенд отбирает записи за период построчно
+DAILY_INFO_RECORD = re.compile(rb'(<(?:ro|KR)>)')
+
+
+def _period_url(base_url, start_date, end_date):
+    return (f"{base_url}?UniDbQuery.Posted=True"
+            f"&UniDbQuery.From={start_date.strftime('%d.%m.%Y')}&UniDbQuery.To={end_date.strftime('%d.%m.%Y')}")
+
+
+def _save(filename, content):
+    with open(os.path.join(FIXTURES_DIR, filename), 'wb') as f:
+        f.write(content)
+    print(f"{filename}: {len(content)} байт")
+
+
+def main():
+    today = datetime.now()
+    pages = {
+        'key_indicators': KEY_INDICATORS_URL,
+        # Страница без периода: стенд отдает ее на запросы без UniDbQuery.From/To
+        'ruonia_short': RUONIA_URL,
+        'ruonia_long': ruonia_history_url(today - timedelta(days=365 * 3), today),
+        'key_rate': _period_url(KEY_RATE_URL, today - timedelta(days=365 * 3), today),
+        'cal_mp': MEETINGS_URL,
+    }
+
+    with httpx.Client(headers=HEADERS, timeout=30, follow_redirects=True) as client:
+        for name, url in pages.items():
+            response = client.get(url)
+            response.raise_for_status()
+            _save(name + '.html', response.content)
+
+        start = (today - timedelta(days=365 * 3)).strftime('%Y-%m-%dT00:00:00')
+        end = today.strftime('%Y-%m-%dT00:00:00')
+        for method, name in DAILY_INFO_FIXTURES.items():
+            response = client.post(
+                DAILY_INFO_URL,
+                content=SOAP_ENVELOPE.format(method=method, start=start, end=end).encode('utf-8'),
+                headers={'Content-Type': 'text/xml; charset=utf-8', 'SOAPAction': f'"{DAILY_INFO_NAMESPACE}{method}"'}
+            )
+            response.raise_for_status()
+            _save(name + '.xml', DAILY_INFO_RECORD.sub(rb'\n\1', response.content))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Офлайн-бенчмарки разбора страниц ЦБ и конвейеров /check, /prog и ежедневного отчета
+
+Сайт ЦБ и Bot API подменяются локальным стендом на записанных
+страницах, поэтому замеры не зависят от сети. Результаты сравниваются
+с benchmarks/baseline.json.
+
+    python benchmarks/run.py                  # замер и сравнение с базовыми результатами
+    python benchmarks/run.py --check          # код выхода 1 при замедлении сверх допуска
+    python benchmarks/run.py --save-baseline  # сохранить текущие результаты как базовые
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import timeit
+import asyncio
+import argparse
+import platform
+import tempfile
+import statistics
+from functools import partial
+from contextlib import redirect_stdout
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from fake_server import FakeServer, FIXTURES_DIR, DAILY_INFO_PATH
+
+BASELINE_FILE = os.path.join(BENCH_DIR, 'baseline.json')
+
+# Стенд поднимается до импорта модулей бота: адреса читаются при импорте
+server = FakeServer().start()
+work_dir = tempfile.mkdtemp(prefix='ruonia-bench-')
+os.environ.update({
+    'CBR_BASE_URL': server.base_url,
+    'TELEGRAM_API_URL': server.base_url,
+    'TELEGRAM_BOT_TOKEN': 'bench:token',
+    'TELEGRAM_CHAT_ID': '1',
+    'BOT_DB_PATH': os.path.join(work_dir, 'bot_data.db'),
+    # Без расписания публикаций: иначе теплые замеры зависели бы от дня и часа запуска
+    'FRESHNESS_MAX_AGE': '0',
+})
+# Локальные файлы бота — во временном каталоге
+os.chdir(work_dir)
+
+import storage
+import retry
+import http_cache
+import meeting_calendar
+import spread_aggregates
+import command_handler
+import scheduled_bot
+import cbr_data
+from cbr_data import parse_key_indicators, parse_rate_table, parse_meeting_dates, parse_daily_info
+from http_client import close_async_client
+
+PARSERS = [
+    ('parse_key_indicators', parse_key_indicators, 'key_indicators.html'),
+    ('parse_rate_table[ruonia_short]', parse_rate_table, 'ruonia_short.html'),
+    ('parse_rate_table[ruonia_long]', parse_rate_table, 'ruonia_long.html'),
+    ('parse_rate_table[key_rate]', parse_rate_table, 'key_rate.html'),
+    ('parse_meeting_dates', parse_meeting_dates, 'cal_mp.html'),
+    ('parse_daily_info[ruonia]', partial(parse_daily_info, date_field='D0', rate_field='ruo'), 'dailyinfo_ruonia.xml'),
+    ('parse_daily_info[key_rate]', partial(parse_daily_info, date_field='DT', rate_field='Rate'), 'dailyinfo_key_rate.xml'),
+]
+
+
+def _fixture(name):
+    # Ответ веб-сервиса разбирается из байтов, как он приходит из сети
+    if name.endswith('.xml'):
+        with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+            return f.read()
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def _summary(samples):
+    return {'median_ms': statistics.median(samples) * 1000, 'min_ms': min(samples) * 1000, 'runs': len(samples)}
+
+
+def bench_parsers(repeat):
+    results = {}
+    for name, parser, fixture in PARSERS:
+        html = _fixture(fixture)
+        timer = timeit.Timer(lambda: parser(html))
+        # Быстрые разборщики вызываются сериями не короче 0,2 с, чтобы шум таймера не влиял на результат
+        number, _ = timer.autorange()
+        samples = [total / number for total in timer.repeat(repeat, number)]
+        results[name] = _summary(samples)
+    return results
+
+
+_cold_runs = 0
+
+
+async def reset_state():
+    """Чистое состояние, как при первом запуске: новая база, пустые кэши, новые соединения"""
+    global _cold_runs
+    _cold_runs += 1
+    await close_async_client()
+    if http_cache._cache is not None:
+        http_cache._cache.conn.close()
+        http_cache._cache = None
+    meeting_calendar._calendar = None
+    spread_aggregates._aggregates = None
+    retry._breakers.clear()
+    storage.DB_PATH = os.path.join(work_dir, f'bot_data_{_cold_runs}.db')
+
+
+async def run_command(text):
+    server.push_update(text)
+    await command_handler.check_for_commands()
+
+
+def with_source(source, pipeline):
+    """Конвейер с источником данных CBR_DATA_SOURCE=source"""
+    async def run():
+        previous = cbr_data.CBR_DATA_SOURCE
+        cbr_data.CBR_DATA_SOURCE = source
+        try:
+            await pipeline()
+        finally:
+            cbr_data.CBR_DATA_SOURCE = previous
+    return run
+
+
+def with_failure(path, pipeline):
+    """Конвейер, во время которого стенд отвечает 500 на запросы к path
+
+    Отказ одного адреса не должен отключать автоматом запасные страницы
+    сайта на том же хосте.
+    """
+    async def run():
+        server.failing.add(path)
+        try:
+            await pipeline()
+        finally:
+            server.failing.discard(path)
+        opened = [key for key, breaker in retry._breakers.items() if breaker.opened_at is not None and not key.endswith(path)]
+        if opened:
+            raise RuntimeError(f"при отказе {path} отключены запасные источники: {', '.join(opened)}")
+    return run
+
+
+PIPELINES = [
+    ('/check', lambda: run_command('/check')),
+    ('/prog', lambda: run_command('/prog')),
+    ('/prog 365', lambda: run_command('/prog 365')),
+    ('daily_report', scheduled_bot.send_daily_report),
+    ('/prog 365 [xml]', with_source('xml', lambda: run_command('/prog 365'))),
+    ('daily_report [xml]', with_source('xml', scheduled_bot.send_daily_report)),
+    # Веб-сервис недоступен: данные берутся со страниц сайта
+    ('/prog 365 [xml, DailyInfo 500]', with_source('xml', with_failure(DAILY_INFO_PATH, lambda: run_command('/prog 365')))),
+]
+
+
+async def _timed(pipeline):
+    sent = len(server.sent)
+    with redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        await pipeline()
+        elapsed = time.perf_counter() - started
+    if len(server.sent) != sent + 1:
+        raise RuntimeError('конвейер не отправил ответ')
+    return elapsed
+
+
+async def bench_pipelines(cold_repeat, warm_repeat):
+    results = {}
+    for name, pipeline in PIPELINES:
+        cold = []
+        for _ in range(cold_repeat):
+            await reset_state()
+            cold.append(await _timed(pipeline))
+        # Теплый запуск: данные в локальной базе и HTTP-кэше, соединения открыты
+        warm = [await _timed(pipeline) for _ in range(warm_repeat)]
+        results[f'{name} (cold)'] = _summary(cold)
+        results[f'{name} (warm)'] = _summary(warm)
+    await close_async_client()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Таблица сравнения с базовыми результатами; список замедлившихся замеров"""
+    regressions = []
+    print(f"{'Замер':42} {'База, мс':>10} {'Сейчас, мс':>11} {'Отношение':>10}")
+    for name, result in results.items():
+        current = result['median_ms']
+        base = baseline.get(name, {}).get('median_ms')
+        if base is None:
+            print(f"{name:42} {'—':>10} {current:11.3f} {'—':>10}")
+            continue
+        ratio = current / base if base else float('inf')
+        mark = ''
+        if ratio > tolerance:
+            regressions.append(name)
+            mark = '  ⚠️'
+        print(f"{name:42} {base:10.3f} {current:11.3f} {ratio:9.2f}x{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Офлайн-бенчмарки бота RUONIA')
+    parser.add_argument('--parser-repeat', type=int, default=5, help='серий замера каждого разборщика')
+    parser.add_argument('--cold-repeat', type=int, default=3, help='холодных запусков каждого конвейера')
+    parser.add_argument('--warm-repeat', type=int, default=10, help='теплых запусков каждого конвейера')
+    parser.add_argument('--tolerance', type=float, default=1.5, help='допустимое отношение к базовому времени')
+    parser.add_argument('--check', action='store_true', help='код выхода 1 при замедлении сверх допуска')
+    parser.add_argument('--save-baseline', action='store_true', help='сохранить результаты в baseline.json')
+    args = parser.parse_args()
+
+    results = bench_parsers(args.parser_repeat)
+    results.update(asyncio.run(bench_pipelines(args.cold_repeat, args.warm_repeat)))
+    server.stop()
+
+    if args.save_baseline:
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'results': results,
+            }, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        print(f"Базовые результаты сохранены в {BASELINE_FILE}")
+
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, encoding='utf-8') as f:
+            baseline = json.load(f).get('results', {})
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"Медленнее базовых более чем в {args.tolerance}x: {', '.join(regressions)}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
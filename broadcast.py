@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Параллельная рассылка одного сообщения многим чатам в пределах лимитов Telegram"""
+
+import os
+import time
+import asyncio
+from telegram.error import RetryAfter, Forbidden, BadRequest, TimedOut, NetworkError
+from retry import RetryPolicy
+from metrics import timer, increment
+
+# Лимиты Bot API: около 30 сообщений в секунду всего и не чаще раза в секунду в один чат
+GLOBAL_RATE = float(os.getenv('BROADCAST_GLOBAL_RATE', '25'))
+PER_CHAT_INTERVAL = float(os.getenv('BROADCAST_PER_CHAT_INTERVAL', '1'))
+# Одновременно ожидающих ответа запросов sendMessage
+BROADCAST_CONCURRENCY = int(os.getenv('BROADCAST_CONCURRENCY', '20'))
+
+SEND_POLICY = RetryPolicy(max_attempts=3, base_delay=1, max_delay=10)
+
+
+class Delivery:
+    """Результат доставки в один чат: sent, blocked или failed"""
+
+    def __init__(self, chat_id, status, attempts, error=None):
+        self.chat_id = chat_id
+        self.status = status
+        self.attempts = attempts
+        self.error = error
+
+    def __repr__(self):
+        return f"Delivery({self.chat_id}, {self.status}, попыток: {self.attempts})"
+
+
+class RateLimiter:
+    """Общий лимит отправки: равномерные интервалы 1/rate и пауза всей рассылки по retry_after"""
+
+    def __init__(self, rate=GLOBAL_RATE, per_chat_interval=PER_CHAT_INTERVAL):
+        self.interval = 1.0 / rate
+        self.per_chat_interval = per_chat_interval
+        self._next_slot = 0.0
+        self._paused_until = 0.0
+        self._chat_slots = {}
+
+    def pause(self, seconds):
+        """Telegram попросил подождать: следующие отправки не раньше чем через seconds"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._next_slot = max(self._next_slot, self._paused_until)
+
+    async def acquire(self, chat_id):
+        while True:
+            # Слот резервируется до ожидания, поэтому конкурирующие задачи получают разные слоты
+            now = time.monotonic()
+            slot = max(now, self._next_slot, self._chat_slots.get(chat_id, 0.0))
+            self._next_slot = slot + self.interval
+            self._chat_slots[chat_id] = slot + self.per_chat_interval
+            if slot > now:
+                await asyncio.sleep(slot - now)
+            # Пока задача ждала, рассылку могли поставить на паузу: тогда слот выделяется заново
+            if time.monotonic() >= self._paused_until:
+                return
+
+
+async def _deliver(bot, chat_id, text, limiter, semaphore, policy):
+    attempt = 0
+    while True:
+        attempt += 1
+        await limiter.acquire(chat_id)
+        try:
+            async with semaphore:
+                with timer('telegram.send'):
+                    await bot.send_message(chat_id=chat_id, text=text)
+            return Delivery(chat_id, 'sent', attempt)
+
+        except RetryAfter as e:
+            # 429: ждет вся рассылка, попытка не засчитывается как ошибка чата
+            retry_after = float(e.retry_after)
+            increment('telegram_retry_after')
+            print(f"Telegram просит подождать {retry_after:.0f} с")
+            limiter.pause(retry_after)
+            if attempt >= policy.max_attempts * 3:
+                return Delivery(chat_id, 'failed', attempt, str(e))
+
+        except Forbidden as e:
+            # Бот заблокирован или удален из чата: повторять бессмысленно
+            return Delivery(chat_id, 'blocked', attempt, str(e))
+
+        except BadRequest as e:
+            return Delivery(chat_id, 'failed', attempt, str(e))
+
+        except (TimedOut, NetworkError) as e:
+            if attempt >= policy.max_attempts:
+                return Delivery(chat_id, 'failed', attempt, str(e))
+            await asyncio.sleep(policy.backoff(attempt))
+
+        except Exception as e:
+            return Delivery(chat_id, 'failed', attempt, str(e))
+
+
+async def send_all(bot, messages, policy=SEND_POLICY):
+    """Отправка сообщений (chat_id, text) параллельно под общим лимитом; список Delivery в том же порядке
+
+    Время рассылки определяется лимитом отправки, а не суммой времени
+    ответов: запросы идут одновременно, лимитер лишь расставляет их
+    по слотам.
+    """
+    if not messages:
+        return []
+
+    limiter = RateLimiter()
+    semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+    with timer('broadcast'):
+        results = await asyncio.gather(*(
+            _deliver(bot, chat_id, text, limiter, semaphore, policy) for chat_id, text in messages
+        ))
+
+    for result in results:
+        increment('deliveries', status=result.status)
+        if result.status == 'sent':
+            print(f"Сообщение отправлено в чат {result.chat_id}")
+        else:
+            print(f"Ошибка при отправке в чат {result.chat_id}: {result.error}")
+    return results
+
+
+async def broadcast(bot, chat_ids, text, policy=SEND_POLICY):
+    """Одно сообщение во все чаты chat_ids (повторы убираются)"""
+    return await send_all(bot, [(chat_id, text) for chat_id in dict.fromkeys(chat_ids)], policy)
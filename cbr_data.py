@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Общие функции получения данных с сайта ЦБ для command_handler.py и scheduled_bot.py"""
+
+import os
+import re
+import time
+import hashlib
+from bs4 import BeautifulSoup
+from datetime import datetime, timedelta
+from xml.etree import ElementTree
+from urllib.parse import urlsplit
+from retry import retry_call
+from http_client import get_async_client
+from html_extract import extract_table_rows, extract_text
+from http_cache import get_cache
+from metrics import timer, increment
+from trading_calendar import freshness_ttl
+
+# Адрес сайта ЦБ можно подменить локальным стендом (бенчмарки, тесты)
+CBR_BASE_URL = os.getenv('CBR_BASE_URL', 'https://cbr.ru').rstrip('/')
+# Ключевые показатели и веб-сервис ЦБ работают на www.cbr.ru; стенд подменяет оба адреса
+CBR_WWW_URL = os.getenv('CBR_BASE_URL', 'https://www.cbr.ru').rstrip('/')
+KEY_INDICATORS_URL = f'{CBR_WWW_URL}/key-indicators/'
+RUONIA_URL = f'{CBR_BASE_URL}/hd_base/ruonia/dynamics/'
+MEETINGS_URL = f'{CBR_BASE_URL}/DKP/cal_mp/'
+KEY_RATE_URL = f'{CBR_BASE_URL}/hd_base/KeyRate/'
+# Веб-сервис ЦБ с теми же рядами в XML (SOAP); документированный адрес на www.cbr.ru —
+# перенаправление с cbr.ru превратило бы POST в GET
+DAILY_INFO_URL = f'{CBR_WWW_URL}/DailyInfoWebServ/DailyInfo.asmx'
+DAILY_INFO_NAMESPACE = 'http://web.cbr.ru/'
+# Вызов метода веб-сервиса за период (SOAP 1.1)
+SOAP_ENVELOPE = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>'
+    '<{method} xmlns="http://web.cbr.ru/"><fromDate>{start}</fromDate><ToDate>{end}</ToDate></{method}>'
+    '</soap:Body></soap:Envelope>'
+)
+
+# Источник RUONIA и ключевой ставки: html (страницы сайта) или xml (веб-сервис);
+# если выбранный источник недоступен, данные берутся со страниц сайта
+CBR_DATA_SOURCE = os.getenv('CBR_DATA_SOURCE', 'html')
+# За сколько последних дней веб-сервис запрашивается ради текущей ставки
+RECENT_DAYS = 14
+
+# Сколько секунд страница считается актуальной без проверки на сервере; вне окон
+# публикации (trading_calendar) срок продлевается до следующей возможной публикации
+KEY_INDICATORS_TTL = 10 * 60
+RUONIA_TTL = 60 * 60
+MEETINGS_TTL = 24 * 60 * 60
+KEY_RATE_TTL = 60 * 60
+
+# "RUONIA за ДД.ММ.ГГГГ XX,XX"
+RUONIA_PATTERN = re.compile(r'RUONIA\s+за\s+(\d{2}\.\d{2}\.\d{4})\s+([\d,]+)')
+# "с ДД.ММ.ГГГГ XX,XX%"
+KEY_RATE_DATE_PATTERN = re.compile(r'с\s+(\d{2}\.\d{2}\.\d{4})')
+KEY_RATE_PATTERN = re.compile(r'с\s+\d{2}\.\d{2}\.\d{4}\s+([\d,]+)%')
+# "ДД.ММ.ГГГГ" в ячейке таблицы
+DATE_PATTERN = re.compile(r'(\d{2})\.(\d{2})\.(\d{4})$')
+# "19 декабря 2025 года" или "19 декабря 2025"
+MEETING_DATE_PATTERN = re.compile(
+    r'(\d{1,2})\s+(января|февраля|марта|апреля|мая|июня|июля|августа|сентября|октября|ноября|декабря)\s+(\d{4})(?:\s+года)?'
+)
+MONTHS = {
+    'января': 1, 'февраля': 2, 'марта': 3, 'апреля': 4,
+    'мая': 5, 'июня': 6, 'июля': 7, 'августа': 8,
+    'сентября': 9, 'октября': 10, 'ноября': 11, 'декабря': 12
+}
+
+
+class KeyIndicators:
+    """Снимок страницы ключевых показателей ЦБ: RUONIA и ключевая ставка с датами"""
+
+    def __init__(self, ruonia=None, ruonia_date=None, key_rate=None, key_rate_date=None):
+        self.ruonia = ruonia
+        self.ruonia_date = ruonia_date
+        self.key_rate = key_rate
+        self.key_rate_date = key_rate_date
+
+    def __repr__(self):
+        return (f"KeyIndicators(ruonia={self.ruonia}, ruonia_date={self.ruonia_date}, "
+                f"key_rate={self.key_rate}, key_rate_date={self.key_rate_date})")
+
+
+def page_name(url):
+    """Короткое имя страницы ЦБ для метрик: последний сегмент пути"""
+    return urlsplit(url).path.rstrip('/').rsplit('/', 1)[-1] or urlsplit(url).hostname
+
+
+def timed_parse(parser, content, url):
+    """Разбор страницы с замером времени как этапа cbr.parse"""
+    with timer('cbr.parse', source=page_name(url)):
+        return parser(content)
+
+
+async def fetch_page(url, description, ttl=0, data=None, headers=None, use_cache=True):
+    """Загрузка страницы без блокировки цикла событий; None, если попытки исчерпаны
+
+    Ответ сохраняется в кэше: в течение ttl секунд страница берется из него
+    без обращения к ЦБ, после — проверяется условным запросом
+    (If-None-Match/If-Modified-Since) и при ответе 304 не скачивается заново.
+    С телом data отправляется POST-запрос (веб-сервис ЦБ), ответ кэшируется
+    по адресу и хешу тела. С use_cache=False страница скачивается без
+    кэша и не сохраняется в нем (разовые загрузки больших периодов).
+    """
+    source = page_name(url)
+    cache_key = url if data is None else f'{url}#{hashlib.sha1(data).hexdigest()}'
+    cache = get_cache()
+    cached = cache.get(cache_key) if use_cache else None
+    if cached and cached.age() < ttl:
+        increment('http_cache', result='hit', source=source)
+        return cached.body
+
+    async def request(timeout):
+        request_headers = dict(headers or {})
+        if cached:
+            request_headers.update(cached.conditional_headers())
+        if data is None:
+            response = await get_async_client().get(url, headers=request_headers, timeout=timeout)
+        else:
+            response = await get_async_client().post(url, content=data, headers=request_headers, timeout=timeout)
+        if cached and response.status_code == 304:
+            increment('http_cache', result='revalidated', source=source)
+            cache.touch(cache_key)
+            return cached.body
+
+        response.raise_for_status()
+        increment('http_cache', result='miss', source=source)
+        if use_cache:
+            cache.put(cache_key, response.content, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return response.content
+
+    try:
+        with timer('cbr.network', source=source):
+            # Отдельный автомат отключения на каждый адрес: отказ веб-сервиса не должен
+            # отключать страницы сайта на том же хосте, к которым идет запасной запрос
+            parts = urlsplit(url)
+            return await retry_call(request, parts.hostname, description, breaker_key=f'{parts.hostname}{parts.path}')
+    except Exception as e:
+        print(f"❌ Не удалось получить {description}: {e}")
+        if cached:
+            increment('http_cache', result='stale', source=source)
+            print(f"Используется сохраненная копия от {time.strftime('%d.%m.%Y %H:%M', time.localtime(cached.fetched_at))}")
+            return cached.body
+        return None
+
+
+def _indicators_from_text(text):
+    """Поиск RUONIA и ключевой ставки в тексте страницы"""
+    indicators = KeyIndicators()
+
+    ruonia_match = RUONIA_PATTERN.search(text)
+    if ruonia_match:
+        indicators.ruonia_date = datetime.strptime(ruonia_match.group(1), '%d.%m.%Y')
+        indicators.ruonia = float(ruonia_match.group(2).replace(',', '.'))
+
+    # Ключевая ставка учитывается только вместе с датой установления
+    date_match = KEY_RATE_DATE_PATTERN.search(text)
+    rate_match = KEY_RATE_PATTERN.search(text)
+    if date_match and rate_match:
+        indicators.key_rate_date = datetime.strptime(date_match.group(1), '%d.%m.%Y')
+        indicators.key_rate = float(rate_match.group(1).replace(',', '.'))
+
+    return indicators
+
+
+def parse_key_indicators(html):
+    """Разбор страницы ключевых показателей за один проход"""
+    indicators = _indicators_from_text(extract_text(html))
+    if indicators.ruonia is None and indicators.key_rate is None:
+        # Разметка не распознана, разбираем через BeautifulSoup
+        indicators = _indicators_from_text(BeautifulSoup(html, 'html.parser').get_text())
+    return indicators
+
+
+def _soup_table_rows(html):
+    """Строки таблицы table.data через BeautifulSoup (запасной вариант)"""
+    soup = BeautifulSoup(html, 'html.parser')
+    table = soup.find('table', class_='data')
+    if not table:
+        return []
+
+    rows = []
+    for row in table.find_all('tr')[1:]:  # Пропускаем заголовок
+        cells = [cell.get_text(strip=True) for cell in row.find_all('td')]
+        if cells:
+            rows.append(cells)
+    return rows
+
+
+def parse_rate_table(html):
+    """Разбор таблицы ставок (динамика RUONIA, ключевая ставка) в список {'date': datetime, 'rate': float}"""
+    rows = extract_table_rows(html)
+    if rows is None:
+        rows = _soup_table_rows(html)
+
+    history = []
+    for cells in rows:
+        if len(cells) >= 2:
+            date_match = DATE_PATTERN.match(cells[0])
+            if not date_match:
+                continue
+            try:
+                date = datetime(int(date_match.group(3)), int(date_match.group(2)), int(date_match.group(1)))
+                rate = float(cells[1].replace(',', '.'))
+                history.append({
+                    'date': date,
+                    'rate': rate
+                })
+            except ValueError:
+                continue
+
+    return history
+
+
+def _meeting_dates_from_matches(matches):
+    meeting_dates = set()
+    for match in matches:
+        try:
+            meeting_dates.add(datetime(int(match.group(3)), MONTHS[match.group(2)], int(match.group(1))))
+        except ValueError:
+            continue
+    return meeting_dates
+
+
+def parse_meeting_dates(html):
+    """Все даты заседаний по ключевой ставке со страницы календаря, по возрастанию"""
+    meeting_dates = _meeting_dates_from_matches(MEETING_DATE_PATTERN.finditer(extract_text(html)))
+
+    if not meeting_dates:
+        # Разметка не распознана: даты встречаются в h3 и в тексте страницы
+        soup = BeautifulSoup(html, 'html.parser')
+        matches = (MEETING_DATE_PATTERN.search(elem.get_text(strip=True)) for elem in soup.find_all(['h3', 'p', 'div']))
+        meeting_dates = _meeting_dates_from_matches(match for match in matches if match)
+
+    return sorted(meeting_dates)
+
+
+def parse_daily_info(xml, date_field, rate_field):
+    """Разбор ответа DailyInfoWebServ в список {'date': datetime, 'rate': float}; None, если это не XML
+
+    Записи идут от новых дат к старым, как в таблицах на сайте. Элементы
+    обходятся один раз в порядке документа: в каждой записи поле даты
+    date_field идет перед полем ставки rate_field. Пространства имен не
+    учитываются.
+    """
+    try:
+        root = ElementTree.fromstring(xml)
+    except ElementTree.ParseError:
+        return None
+
+    history = []
+    date_text = None
+    for element in root.iter():
+        tag = element.tag
+        if tag[0] == '{':
+            tag = tag.rsplit('}', 1)[-1]
+        if tag == date_field:
+            date_text = element.text
+        elif tag == rate_field and date_text:
+            try:
+                # "2024-01-09T00:00:00+03:00"; strptime на тысячах записей заметно медленнее
+                date = datetime(int(date_text[0:4]), int(date_text[5:7]), int(date_text[8:10]))
+                history.append({'date': date, 'rate': float(element.text)})
+            except (TypeError, ValueError):
+                pass
+            date_text = None
+
+    history.sort(key=lambda entry: entry['date'], reverse=True)
+    return history
+
+
+async def get_key_indicators():
+    """Получение RUONIA и ключевой ставки с главной страницы ЦБ одним запросом"""
+    content = await fetch_page(
+        KEY_INDICATORS_URL, 'ключевых показателей', ttl=freshness_ttl(KEY_INDICATORS_TTL, 'ruonia', 'key_rate')
+    )
+    return timed_parse(parse_key_indicators, content, KEY_INDICATORS_URL) if content else KeyIndicators()
+
+
+class HtmlSource:
+    """Таблицы table.data на страницах сайта ЦБ
+
+    Методы источников возвращают None, если данные получить не удалось,
+    и пустой список, если за период нет записей.
+    """
+
+    name = 'html'
+
+    async def ruonia_rate(self):
+        """Текущая ставка RUONIA со страницы динамики"""
+        content = await fetch_page(RUONIA_URL, 'RUONIA', ttl=freshness_ttl(RUONIA_TTL, 'ruonia'))
+        if not content:
+            return None
+
+        history = timed_parse(parse_rate_table, content, RUONIA_URL)
+        return history[0]['rate'] if history else None
+
+    async def key_rate(self):
+        """Текущая ключевая ставка со страницы истории ключевой ставки"""
+        content = await fetch_page(KEY_RATE_URL, 'ключевой ставки', ttl=freshness_ttl(KEY_RATE_TTL, 'key_rate'))
+        if not content:
+            return None
+
+        history = timed_parse(parse_rate_table, content, KEY_RATE_URL)
+        return history[0]['rate'] if history else None
+
+    async def ruonia_history(self, start_date, end_date):
+        """История RUONIA за период с использованием параметров в URL"""
+        url = ruonia_history_url(start_date, end_date)
+        content = await fetch_page(url, 'истории RUONIA', ttl=freshness_ttl(RUONIA_TTL, 'ruonia'))
+        return timed_parse(parse_rate_table, content, url) if content else None
+
+    async def key_rate_history(self, start_date, end_date):
+        """Ключевая ставка по дням за период со страницы cbr.ru/hd_base/KeyRate/"""
+        url = key_rate_history_url(start_date, end_date)
+        content = await fetch_page(url, 'истории ключевой ставки', ttl=freshness_ttl(KEY_RATE_TTL, 'key_rate'))
+        return timed_parse(parse_rate_table, content, url) if content else None
+
+
+class XmlSource:
+    """Веб-сервис DailyInfoWebServ: те же ряды в компактном XML без разметки страницы"""
+
+    name = 'xml'
+
+    async def _call(self, method, date_field, rate_field, start_date, end_date, description, ttl):
+        body = SOAP_ENVELOPE.format(
+            method=method,
+            start=start_date.strftime('%Y-%m-%dT00:00:00'),
+            end=end_date.strftime('%Y-%m-%dT00:00:00'),
+        ).encode('utf-8')
+        headers = {
+            'Content-Type': 'text/xml; charset=utf-8',
+            'SOAPAction': f'"{DAILY_INFO_NAMESPACE}{method}"',
+        }
+        content = await fetch_page(DAILY_INFO_URL, description, ttl=ttl, data=body, headers=headers)
+        if not content:
+            return None
+
+        with timer('cbr.parse', source=method):
+            return parse_daily_info(content, date_field, rate_field)
+
+    async def _latest(self, history_method):
+        today = datetime.now()
+        history = await history_method(today - timedelta(days=RECENT_DAYS), today)
+        return history[0]['rate'] if history else None
+
+    async def ruonia_rate(self):
+        return await self._latest(self.ruonia_history)
+
+    async def key_rate(self):
+        return await self._latest(self.key_rate_history)
+
+    async def ruonia_history(self, start_date, end_date):
+        return await self._call('RuoniaXML', 'D0', 'ruo', start_date, end_date, 'истории RUONIA',
+                                freshness_ttl(RUONIA_TTL, 'ruonia'))
+
+    async def key_rate_history(self, start_date, end_date):
+        return await self._call('KeyRateXML', 'DT', 'Rate', start_date, end_date, 'истории ключевой ставки',
+                                freshness_ttl(KEY_RATE_TTL, 'key_rate'))
+
+
+# Источники по значению CBR_DATA_SOURCE; у всех одинаковый набор методов
+DATA_SOURCES = {
+    'html': HtmlSource(),
+    'xml': XmlSource(),
+}
+
+
+async def _query(method, *args):
+    """Данные из выбранного источника; если его не удалось получить — со страниц сайта"""
+    selected = DATA_SOURCES.get(CBR_DATA_SOURCE)
+    if selected is None:
+        print(f"Неизвестный источник данных CBR_DATA_SOURCE={CBR_DATA_SOURCE}, используются страницы сайта")
+        selected = DATA_SOURCES['html']
+
+    result = await getattr(selected, method)(*args)
+    if result is not None or selected is DATA_SOURCES['html']:
+        return result
+
+    increment('data_source_fallback', source=selected.name)
+    print(f"⚠️ Источник {selected.name} недоступен, используются страницы сайта")
+    return await getattr(DATA_SOURCES['html'], method)(*args)
+
+
+async def get_ruonia_rate():
+    """Получение текущей ставки RUONIA (запасной вариант для страницы ключевых показателей)"""
+    return await _query('ruonia_rate')
+
+
+async def get_key_rate():
+    """Получение текущей ключевой ставки"""
+    return await _query('key_rate')
+
+
+def ruonia_history_url(start_date, end_date):
+    """Адрес страницы динамики RUONIA за период"""
+    # Форматируем даты в формат ДД.ММ.ГГГГ для URL
+    start_str = start_date.strftime('%d.%m.%Y')
+    end_str = end_date.strftime('%d.%m.%Y')
+    return f'{RUONIA_URL}?UniDbQuery.Posted=True&UniDbQuery.From={start_str}&UniDbQuery.To={end_str}'
+
+
+def key_rate_history_url(start_date, end_date):
+    """Адрес страницы истории ключевой ставки за период"""
+    start_str = start_date.strftime('%d.%m.%Y')
+    end_str = end_date.strftime('%d.%m.%Y')
+    return f'{KEY_RATE_URL}?UniDbQuery.Posted=True&UniDbQuery.From={start_str}&UniDbQuery.To={end_str}'
+
+
+async def get_ruonia_history_parametrized(start_date, end_date):
+    """Получение истории RUONIA за период"""
+    return await _query('ruonia_history', start_date, end_date) or []
+
+
+async def get_key_rate_history(start_date, end_date):
+    """Получение ключевой ставки по дням за период"""
+    return await _query('key_rate_history', start_date, end_date) or []
@@ -2,14 +2,21 @@
 # -*- coding: utf-8 -*-
 
 import os
-import requests
-import re
-from bs4 import BeautifulSoup
-from datetime import datetime, timedelta
-from telegram import Bot
+import argparse
 import asyncio
-import json
-import time
+import signal
+from report_data import collect_report_data, collect_spread_series
+from retry import deadline, COMMAND_DEADLINE
+from http_client import get_async_client, close_async_client, create_bot, TELEGRAM_API_URL
+from analytics import WINDOWS
+from report_text import render_check, render_prog, render_prog_window
+from report_snapshot import (SNAPSHOT_COMMANDS, build_snapshot, load_fresh_snapshot, save_snapshot,
+                             needs_refresh, refresh_snapshot, run_refresher)
+from metrics import timer, increment, print_summary, start_metrics_server
+from offset_store import OffsetStore
+from subscribers import SubscriberStore
+from alerts import AlertStore, alert_command, has_alerts, ingest as ingest_alerts
+from broadcast import send_all
 
 # Получаем токен и chat_id из переменных окружения
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
@@ -19,358 +26,292 @@ if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
     print("Ошибка: Не указаны TELEGRAM_BOT_TOKEN или TELEGRAM_CHAT_ID")
     exit(1)
 
-def get_key_rate_from_main_page(max_retries=2, retry_delay=30):
-    """Получение ключевой ставки и даты установления с главной страницы ЦБ"""
-    for attempt in range(max_retries):
-        try:
-            url = 'https://www.cbr.ru/key-indicators/'
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Ищем ключевую ставку и дату
-            key_rate = None
-            key_rate_date = None
-            
-            # Поиск текста "с 27.10.2025" и "16,50%"
-            text = soup.get_text()
-            
-            # Ищем паттерн "с ДД.ММ.ГГГГ"
-            date_match = re.search(r'с\s+(\d{2}\.\d{2}\.\d{4})', text)
-            if date_match:
-                key_rate_date_str = date_match.group(1)
-                key_rate_date = datetime.strptime(key_rate_date_str, '%d.%m.%Y')
-            
-            # Ищем ключевую ставку после даты
-            rate_match = re.search(r'с\s+\d{2}\.\d{2}\.\d{4}\s+([\d,]+)%', text)
-            if rate_match:
-                key_rate = float(rate_match.group(1).replace(',', '.'))
-            
-            if key_rate and key_rate_date:
-                return key_rate, key_rate_date
-            
-            return None, None
-        
-        except Exception as e:
-            print(f"Ошибка при получении ключевой ставки с главной (попытка {attempt + 1}/{max_retries}): {e}")
-            if attempt < max_retries - 1:
-                print(f"Повторная попытка через {retry_delay} секунд...")
-                time.sleep(retry_delay)
-            else:
-                return None, None
-    
-    return None, None
-
-def get_ruonia_rate_from_main_page(max_retries=2, retry_delay=30):
-    """Получение текущей ставки RUONIA с главной страницы"""
-    for attempt in range(max_retries):
-        try:
-            url = 'https://www.cbr.ru/key-indicators/'
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            text = soup.get_text()
-            
-            # Ищем "RUONIA за ДД.ММ.ГГГГ|XX,XX"
-            ruonia_match = re.search(r'RUONIA\s+за\s+\d{2}\.\d{2}\.\d{4}\s+([\d,]+)', text)
-            if ruonia_match:
-                return float(ruonia_match.group(1).replace(',', '.'))
-            
-            return None
-        
-        except Exception as e:
-            print(f"Ошибка при получении RUONIA с главной (попытка {attempt + 1}/{max_retries}): {e}")
-            if attempt < max_retries - 1:
-                print(f"Повторная попытка через {retry_delay} секунд...")
-                time.sleep(retry_delay)
-            else:
-                return None
-    
-    return None
-
-def get_ruonia_rate(max_retries=2, retry_delay=30):
-    """Получение текущей ставки RUONIA со страницы динамики (запасной вариант)"""
-    for attempt in range(max_retries):
-        try:
-            url = 'https://cbr.ru/hd_base/ruonia/dynamics/'
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            table = soup.find('table', class_='data')
-            
-            if table:
-                rows = table.find_all('tr')
-                if len(rows) > 1:
-                    cells = rows[1].find_all('td')
-                    if len(cells) >= 2:
-                        rate_str = cells[1].get_text(strip=True)
-                        return float(rate_str.replace(',', '.'))
-            
-            return None
-        
-        except Exception as e:
-            print(f"Ошибка при получении RUONIA (попытка {attempt + 1}/{max_retries}): {e}")
-            if attempt < max_retries - 1:
-                print(f"Повторная попытка через {retry_delay} секунд...")
-                time.sleep(retry_delay)
-            else:
-                return None
-    
-    return None
-
-def get_next_meeting_date(max_retries=2, retry_delay=30):
-    """Получение даты следующего заседания по ключевой ставке"""
-    for attempt in range(max_retries):
-        try:
-            url = 'https://cbr.ru/DKP/cal_mp/'
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            today = datetime.now()
-            
-            # Ищем все даты заседаний
-            date_elements = soup.find_all('h3')
-            for elem in date_elements:
-                text = elem.get_text(strip=True)
-                # Пытаемся найти дату в формате "DD месяца YYYY года"
-                match = re.search(r'(\d+)\s+(января|февраля|марта|апреля|мая|июня|июля|августа|сентября|октября|ноября|декабря)\s+(\d{4})', text)
-                if match:
-                    day = int(match.group(1))
-                    month_name = match.group(2)
-                    year = int(match.group(3))
-                    
-                    months = {
-                        'января': 1, 'февраля': 2, 'марта': 3, 'апреля': 4,
-                        'мая': 5, 'июня': 6, 'июля': 7, 'августа': 8,
-                        'сентября': 9, 'октября': 10, 'ноября': 11, 'декабря': 12
-                    }
-                    month = months.get(month_name)
-                    
-                    if month:
-                        meeting_date = datetime(year, month, day)
-                        if meeting_date > today:
-                            return meeting_date
-            
-            return None
-        except Exception as e:
-            print(f"Ошибка при получении даты следующего заседания (попытка {attempt + 1}/{max_retries}): {e}")
-            if attempt < max_retries - 1:
-                print(f"Повторная попытка через {retry_delay} секунд...")
-                time.sleep(retry_delay)
-            else:
-                return None
-    
-    return None
-
-def get_ruonia_history_parametrized(start_date, end_date, max_retries=2, retry_delay=30):
-    """Получение истории RUONIA за период с использованием параметров в URL"""
-    for attempt in range(max_retries):
-        try:
-            # Форматируем даты в формат ДД.ММ.ГГГГ для URL
-            start_str = start_date.strftime('%d.%m.%Y')
-            end_str = end_date.strftime('%d.%m.%Y')
-            
-            url = f'https://cbr.ru/hd_base/ruonia/dynamics/?UniDbQuery.Posted=True&UniDbQuery.From={start_str}&UniDbQuery.To={end_str}'
-            
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            table = soup.find('table', class_='data')
-            
-            if table:
-                rows = table.find_all('tr')[1:]  # Пропускаем заголовок
-                history = []
-                for row in rows:
-                    cells = row.find_all('td')
-                    if len(cells) >= 2:
-                        date_str = cells[0].get_text(strip=True)
-                        rate_str = cells[1].get_text(strip=True)
-                        try:
-                            date = datetime.strptime(date_str, '%d.%m.%Y')
-                            rate = float(rate_str.replace(',', '.'))
-                            history.append({
-                                'date': date,
-                                'rate': rate
-                            })
-                        except ValueError:
-                            continue
-                return history
-            return []
-        except Exception as e:
-            print(f"Ошибка при получении истории RUONIA (попытка {attempt + 1}/{max_retries}): {e}")
-            if attempt < max_retries - 1:
-                print(f"Повторная попытка через {retry_delay} секунд...")
-                time.sleep(retry_delay)
-            else:
-                return []
-    
+# Режим демона: длительность длинного опроса, в секундах
+LONG_POLL_TIMEOUT = int(os.getenv('LONG_POLL_TIMEOUT', '50'))
+# Сколько раз обрабатывать пачку после сбоя, прежде чем ответить ошибкой
+BATCH_MAX_ATTEMPTS = int(os.getenv('BATCH_MAX_ATTEMPTS', '3'))
+
+# Максимальная глубина окна /prog <дней>
+PROG_MAX_DAYS = 366 * 20
+
+# Команды и их псевдонимы
+COMMANDS = {
+    '/check': 'check', '/проверить': 'check',
+    '/prog': 'prog', '/прогноз': 'prog',
+    '/subscribe': 'subscribe', '/подписаться': 'subscribe',
+    '/unsubscribe': 'unsubscribe', '/отписаться': 'unsubscribe',
+    '/alert': 'alert', '/оповещение': 'alert',
+}
+
+# Команды подписки и оповещений не требуют данных ЦБ
+SUBSCRIPTION_COMMANDS = {'subscribe', 'unsubscribe', 'alert'}
+
+async def get_updates(offset, timeout=0, limit=100):
+    """Получение новых сообщений; при timeout > 0 — длинный опрос"""
+    url = f'{TELEGRAM_API_URL}/bot{TELEGRAM_BOT_TOKEN}/getUpdates'
+    params = {'offset': offset, 'limit': limit, 'timeout': timeout}
+
+    # Запрос держится открытым до timeout секунд, таймаут клиента должен быть больше.
+    # Длинный опрос большую часть времени ждет сообщений, поэтому замеряется отдельно
+    with timer('telegram.long_poll' if timeout else 'telegram.receive'):
+        response = await get_async_client().get(url, params=params, timeout=timeout + 30)
+    data = response.json()
+
+    if data.get('ok'):
+        return data.get('result', [])
+    print(f"Ошибка getUpdates: {data.get('description')}")
     return []
 
-def calculate_average_diff(ruonia_history, key_rate):
-    """Расчет средней разницы между RUONIA и ключевой ставкой"""
-    if not ruonia_history:
+def parse_command(update):
+    """Команда, ее аргумент и чат из обновления; (None, None, None), если команды нет"""
+    message = update.get('message')
+    if not message:
+        return None, None, None
+
+    text = message.get('text', '')
+    parts = text.strip().split()
+    if not parts:
+        return None, None, None
+
+    # "/prog@bot_name 365" -> команда prog, аргумент 365; "/alert ruonia > 16" -> аргумент "ruonia > 16"
+    command = COMMANDS.get(parts[0].lower().split('@')[0])
+    argument = None
+    if command == 'prog' and len(parts) > 1:
+        argument = parse_days(parts[1])
+    elif command == 'alert' and len(parts) > 1:
+        argument = ' '.join(parts[1:]).lower()
+    if command:
+        print(f"Получена команда {text} от {message['chat']['id']}")
+    return command, argument, message['chat']['id']
+
+def parse_days(value):
+    """Число дней для окна /prog или None, если аргумент некорректен"""
+    try:
+        days = int(value)
+    except ValueError:
         return None
-    
-    diffs = [entry['rate'] - key_rate for entry in ruonia_history]
-    avg_diff = sum(diffs) / len(diffs)
-    return avg_diff
+    return days if 0 < days <= PROG_MAX_DAYS else None
+
+def handle_subscriptions(chats_by_request):
+    """Подписка, отписка и оповещения чатов; список ответов (запрос, chat_id, текст)"""
+    replies = []
+    store = SubscriberStore()
+    alerts = AlertStore(store.conn)
+    try:
+        for (command, argument), chat_ids in chats_by_request.items():
+            for chat_id in chat_ids:
+                if command == 'alert':
+                    text = alert_command(alerts, chat_id, argument)
+                elif command == 'subscribe':
+                    if store.subscribe(chat_id):
+                        text = "✅ Вы подписаны на ежедневный отчет по ставкам. Отписаться: /unsubscribe"
+                    else:
+                        text = "Вы уже подписаны на ежедневный отчет."
+                elif store.unsubscribe(chat_id):
+                    text = "Вы отписаны от ежедневного отчета. Подписаться снова: /subscribe"
+                else:
+                    text = "Вы не были подписаны на ежедневный отчет."
+                replies.append(((command, argument), chat_id, text))
+    finally:
+        store.close()
+    return replies
+
+async def process_updates(bot, updates, offsets):
+    """Обработка пачки обновлений
+
+    Обновления группируются по командам, данные ЦБ собираются один раз
+    на пачку, каждый ответ формируется один раз и рассылается всем
+    запросившим чатам параллельно. Обновление отмечается в журнале
+    обработанным, как только ответ на него доставлен.
+    """
+    chats_by_request = {}
+    update_ids = {}
+    for update in updates:
+        command, argument, chat_id = parse_command(update)
+        if command:
+            chats = chats_by_request.setdefault((command, argument), [])
+            if chat_id not in chats:
+                chats.append(chat_id)
+            update_ids.setdefault(((command, argument), chat_id), []).append(update['update_id'])
+
+    if not chats_by_request:
+        return
+
+    with timer('batch'):
+        answered = await _answer(bot, chats_by_request)
+    offsets.mark_handled([update_id for key in answered for update_id in update_ids[key]])
+
+async def _answer(bot, chats_by_request):
+    """Сбор данных, формирование и рассылка ответов на сгруппированные команды
+
+    Возвращает пары (запрос, chat_id), ответ на которые доставлен или
+    не может быть доставлен никогда (чат заблокировал бота).
+    """
+    for command, argument in chats_by_request:
+        increment('commands', command=command)
+
+    replies = handle_subscriptions({
+        request: chat_ids for request, chat_ids in chats_by_request.items() if request[0] in SUBSCRIPTION_COMMANDS
+    })
+    chats_by_request = {
+        request: chat_ids for request, chat_ids in chats_by_request.items() if request[0] not in SUBSCRIPTION_COMMANDS
+    }
+    if chats_by_request:
+        replies.extend(await _render_replies(chats_by_request))
+    # Все ответы пачки уходят одной рассылкой под общим лимитом Telegram
+    results = await send_all(bot, [(chat_id, text) for _, chat_id, text in replies])
+    return {
+        (request, chat_id) for (request, chat_id, _), result in zip(replies, results)
+        if request is not None and result.status != 'failed'
+    }
+
+async def _render_replies(chats_by_request):
+    """Ответы (запрос, chat_id, текст) на команды с данными ЦБ
+
+    /check и /prog без аргумента берутся из свежего снимка отчета без
+    обращения к ЦБ. Иначе данные собираются заново, по ним сохраняется
+    новый снимок для следующих команд, а сработавшие оповещения уходят
+    той же рассылкой, с запросом None.
+    """
+    replies = []
+    snapshot = None
+    if all(command in SNAPSHOT_COMMANDS and argument is None for command, argument in chats_by_request):
+        snapshot = load_fresh_snapshot()
+
+    if snapshot is None:
+        # Одна история спреда на самое длинное из окон /prog и окон статистики снимка
+        window_days = [argument for command, argument in chats_by_request if command == 'prog' and argument]
+        with deadline(COMMAND_DEADLINE), timer('collect'):
+            report_data = await collect_report_data()
+            series = await collect_spread_series(max(window_days + [max(WINDOWS)]), report_data.today, report_data.indicators)
+        replies.extend((None, chat_id, text) for chat_id, text in ingest_alerts(report_data))
+
+        with timer('render', command='snapshot'):
+            snapshot = build_snapshot(report_data, series)
+        if snapshot is not None:
+            save_snapshot(snapshot)
+
+    for (command, argument), chat_ids in chats_by_request.items():
+        if argument:
+            with timer('render', command=command):
+                text = render_prog_window(argument, series, report_data.today)
+        elif snapshot is not None:
+            text = snapshot.text(command)
+        else:
+            # Данных на полный отчет нет: тексты с сообщением об ошибке, без сохранения снимка
+            with timer('render', command=command):
+                text = render_check(report_data) if command == 'check' else render_prog(report_data, series)
+        replies.extend(((command, argument), chat_id, text) for chat_id in chat_ids)
+    return replies
+
+async def reply_failure(bot, updates):
+    """Сообщение об ошибке всем чатам, приславшим команды в пачке"""
+    chat_ids = []
+    for update in updates:
+        command, argument, chat_id = parse_command(update)
+        if command and chat_id not in chat_ids:
+            chat_ids.append(chat_id)
+    await send_all(bot, [(chat_id, "❌ Не удалось обработать команду. Попробуйте позже.") for chat_id in chat_ids])
 
 async def check_for_commands():
     """Проверка новых команд от пользователя"""
-    bot = Bot(token=TELEGRAM_BOT_TOKEN)
-    
-    # Получаем ID последнего обработанного сообщения
+    bot = create_bot(TELEGRAM_BOT_TOKEN)
+    offsets = OffsetStore()
+
     try:
-        with open('last_update_id.txt', 'r') as f:
-            last_update_id = int(f.read().strip())
-    except FileNotFoundError:
-        last_update_id = 0
-    
-    # Получаем новые сообщения
-    url = f'https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/getUpdates'
-    params = {'offset': last_update_id + 1, 'limit': 10}
-    
-    response = requests.get(url, params=params)
-    data = response.json()
-    
-    if data.get('ok') and data.get('result'):
-        for update in data['result']:
-            update_id = update['update_id']
-            
-            if 'message' in update:
-                message = update['message']
-                chat_id = message['chat']['id']
-                text = message.get('text', '')
-                
-                # Обработка команды /check
-                if text.strip().lower() in ['/check', '/проверить']:
-                    print(f"Получена команда {text} от {chat_id}")
-                    
-                    # Получаем текущие данные
-                    ruonia = get_ruonia_rate_from_main_page()
-                    key_rate, key_rate_date = get_key_rate_from_main_page()
-                    
-                    # Если не получилось, пробуем старый метод
-                    if not ruonia:
-                        ruonia = get_ruonia_rate()
-                    
-                    if ruonia and key_rate:
-                        diff = ruonia - key_rate
-                        today = datetime.now()
-                        today_str = today.strftime('%d.%m.%Y')
-                        
-                        # Формируем базовое сообщение
-                        if diff > 0:
-                            emoji = '✅'
-                            comparison = 'RUONIA выше ключевой ставки.'
-                        elif diff < 0:
-                            emoji = '⚠️'
-                            comparison = 'RUONIA ниже ключевой ставки.'
-                        else:
-                            emoji = '🔵'
-                            comparison = 'RUONIA равна ключевой ставке.'
-                        
-                        message_text = f"""📊 Ежедневный отчет по ставкам {today_str}:
-
-📈 RUONIA: {ruonia:.2f}%
-🏦 Ключевая ставка ЦБ: {key_rate:.2f}%
-💡 Разница сегодня: {diff:+.2f}%
-{emoji} {comparison}"""
-                        
-                        # Добавляем статистику с последнего заседания
-                        if key_rate_date:
-                            ruonia_history = get_ruonia_history_parametrized(key_rate_date, today)
-                            
-                            if ruonia_history:
-                                avg_diff = calculate_average_diff(ruonia_history, key_rate)
-                                
-                                if avg_diff is not None:
-                                    comparison_avg = "ниже" if avg_diff < 0 else "выше"
-                                    days_count = len(ruonia_history)
-                                    
-                                    message_text += f"""
-
-📅 Статистика с {key_rate_date.strftime('%d.%m.%Y')}:
-📊 Средняя разница: {abs(avg_diff):.2f}% {comparison_avg}
-📆 Торговых дней: {days_count}"""
-                        
-                        # Добавляем дату следующего заседания
-                        next_meeting = get_next_meeting_date()
-                        if next_meeting:
-                            days_until = (next_meeting - today).days
-                            message_text += f"""
-
-🗓 Следующее заседание: {next_meeting.strftime('%d.%m.%Y')}
-⏳ Осталось дней: {days_until}"""
-                        
-                        await bot.send_message(chat_id=chat_id, text=message_text)
-                        with open('last_update_id.txt', 'w') as f:
-                            f.write(str(update_id))
-                            print(f"Сохранен update_id: {update_id}")
-                        print(f"Сообщение отправлено в чат {chat_id}")
-                    else:
-                        await bot.send_message(chat_id=chat_id, text="Ошибка при получении данных о ставках. Попробуйте позже.")
-                        with open('last_update_id.txt', 'w') as f:
-                            f.write(str(update_id))
-                            print("Не удалось получить данные после повторных попыток")
-
-                # Обработка команды /prog
-                elif text.strip().lower() in ['/prog', '/прогноз']:
-                    print(f"Получена команда {text} от {chat_id}")
-                    
-                    # Получаем ключевую ставку и дату установления с главной страницы
-                    current_key_rate, last_change_date = get_key_rate_from_main_page()
-                    
-                    if not current_key_rate or not last_change_date:
-                        await bot.send_message(chat_id=chat_id, text="Не удалось получить данные о ключевой ставке.")
-                        with open('last_update_id.txt', 'w') as f:
-                            f.write(str(update_id))
-                        continue
-                    
-                    # Получаем историю RUONIA с момента последнего изменения
-                    today = datetime.now()
-                    ruonia_history = get_ruonia_history_parametrized(last_change_date, today)
-                    
-                    if not ruonia_history:
-                        await bot.send_message(chat_id=chat_id, text="Не удалось получить историю RUONIA. Попробуйте позже.")
-                        with open('last_update_id.txt', 'w') as f:
-                            f.write(str(update_id))
+        # Накопившиеся сообщения обрабатываются пачками. Следующий getUpdates подтверждает
+        # предыдущую пачку на стороне Telegram, поэтому запрашивается только после ее учета в журнале
+        offset = offsets.last_update_id() + 1
+        while True:
+            updates = await get_updates(offset)
+            if not updates:
+                break
+            try:
+                await process_updates(bot, offsets.unhandled(updates), offsets)
+            except Exception as e:
+                # Попытки считаются в базе: следующий запуск по расписанию получит ту же пачку
+                failures = offsets.record_failure(updates[0]['update_id'])
+                print(f"Ошибка при обработке обновлений (попытка {failures}/{BATCH_MAX_ATTEMPTS}): {e}")
+                if failures < BATCH_MAX_ATTEMPTS:
+                    raise
+                # Пачка так и не обработана: запросившие чаты получают ошибку, пачка учитывается
+                await reply_failure(bot, offsets.unhandled(updates))
+            offsets.commit_batch(updates)
+            offset = updates[-1]['update_id'] + 1
+
+        # Оповещения проверяются при каждом запуске, пока ЦБ может опубликовать новые значения
+        if has_alerts() and needs_refresh():
+            await refresh_snapshot(bot)
+    finally:
+        offsets.close()
+
+async def run_daemon():
+    """Постоянная работа на длинном опросе getUpdates до сигнала остановки"""
+    bot = create_bot(TELEGRAM_BOT_TOKEN)
+    offsets = OffsetStore()
+    last_update_id = offsets.last_update_id()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    stop_task = asyncio.ensure_future(stop.wait())
+    metrics_server = await start_metrics_server()
+    # Снимок отчета обновляется в фоне, команды отвечают из него
+    refresher = asyncio.ensure_future(run_refresher(stop, bot))
+
+    print(f"Бот запущен в режиме демона, длинный опрос {LONG_POLL_TIMEOUT} с")
+    try:
+        while not stop.is_set():
+            poll = asyncio.ensure_future(get_updates(last_update_id + 1, timeout=LONG_POLL_TIMEOUT))
+            await asyncio.wait({poll, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+            if not poll.done():
+                poll.cancel()
+                break
+
+            try:
+                updates = poll.result()
+            except Exception as e:
+                print(f"Ошибка при получении обновлений: {e}")
+                await asyncio.sleep(5)
+                continue
+
+            if updates:
+                try:
+                    await process_updates(bot, offsets.unhandled(updates), offsets)
+                except Exception as e:
+                    failures = offsets.record_failure(updates[0]['update_id'])
+                    print(f"Ошибка при обработке обновлений (попытка {failures}/{BATCH_MAX_ATTEMPTS}): {e}")
+                    if failures < BATCH_MAX_ATTEMPTS:
+                        # Пачка не учитывается в журнале и после паузы будет получена заново
+                        await asyncio.wait({stop_task}, timeout=min(5 * failures, 60))
                         continue
-                    
-                    # Рассчитываем среднюю разницу
-                    avg_diff = calculate_average_diff(ruonia_history, current_key_rate)
-                    
-                    # Получаем дату следующего заседания
-                    next_meeting = get_next_meeting_date()
-                    
-                    if avg_diff is not None:
-                        # Форматируем сообщение
-                        comparison = "ниже" if avg_diff < 0 else "выше"
-                        
-                        message_text = f"""📊 Прогноз и статистика:
-
-С последнего изменения ключевой ставки от {last_change_date.strftime('%d.%m.%Y')} до {today.strftime('%d.%m.%Y')} ставка RUONIA была в среднем на {abs(avg_diff):.2f}% {comparison}, чем ключевая ставка.
-
-Количество торговых дней в анализе: {len(ruonia_history)}"""
-                        
-                        if next_meeting:
-                            days_until = (next_meeting - today).days
-                            message_text += f"\n\nСледующее заседание по ключевой ставке: {next_meeting.strftime('%d.%m.%Y')}"
-                            message_text += f"\nОсталось дней до заседания: {days_until}"
-                        
-                        await bot.send_message(chat_id=chat_id, text=message_text)
-                        with open('last_update_id.txt', 'w') as f:
-                            f.write(str(update_id))
-                        print(f"Прогноз отправлен в чат {chat_id}")
-                    else:
-                        await bot.send_message(chat_id=chat_id, text="Не удалось рассчитать прогноз. Попробуйте позже.")
-                        with open('last_update_id.txt', 'w') as f:
-                            f.write(str(update_id))
+                    # Пачка так и не обработана: запросившие чаты получают ошибку, пачка учитывается
+                    await reply_failure(bot, offsets.unhandled(updates))
+                # Одна транзакция на пачку вместо записи файла на каждое сообщение
+                offsets.commit_batch(updates)
+                last_update_id = updates[-1]['update_id']
+    finally:
+        stop_task.cancel()
+        refresher.cancel()
+        if metrics_server is not None:
+            metrics_server.close()
+        offsets.close()
+        print("Бот остановлен")
+
+async def main(daemon=False):
+    try:
+        if daemon:
+            await run_daemon()
+        else:
+            await check_for_commands()
+    finally:
+        await close_async_client()
+        if not daemon:
+            print_summary('check_for_commands')
 
 if __name__ == '__main__':
-    asyncio.run(check_for_commands())
+    parser = argparse.ArgumentParser(description='Обработка команд бота RUONIA')
+    parser.add_argument('--daemon', action='store_true', help='постоянная работа на длинном опросе вместо однократной проверки')
+    args = parser.parse_args()
+    asyncio.run(main(daemon=args.daemon))
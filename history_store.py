@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Локальное хранилище истории RUONIA с инкрементальной синхронизацией"""
+
+from datetime import datetime, timedelta
+import storage
+from cbr_data import get_ruonia_history_parametrized
+from trading_calendar import ruonia_may_have_new, start_of_day
+from ruonia_series import RuoniaSeries
+
+
+class RuoniaHistoryStore:
+    """История RUONIA по датам в локальной базе
+
+    С сайта ЦБ загружаются только дни после последней сохраненной даты
+    (и до первой, если запрошен более ранний период), запросы по
+    диапазону обслуживаются локально.
+    """
+
+    def __init__(self, conn=None):
+        self.conn = conn or storage.connect()
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS ruonia_history ('
+            'date TEXT PRIMARY KEY, rate REAL NOT NULL)'
+        )
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS history_meta ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL)'
+        )
+        # Вся история одним компактным рядом для быстрой загрузки
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS ruonia_series ('
+            'id INTEGER PRIMARY KEY CHECK (id = 1), data BLOB NOT NULL)'
+        )
+        self.conn.commit()
+        self._series = None
+
+    def _get_meta(self, key):
+        row = self.conn.execute('SELECT value FROM history_meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO history_meta (key, value) VALUES (?, ?)', (key, value)
+        )
+
+    def covered_from(self):
+        """Начало периода, за который история уже загружена"""
+        value = self._get_meta('covered_from')
+        return datetime.strptime(value, '%Y-%m-%d') if value else None
+
+    def extend_coverage(self, start_date):
+        """Отметка, что история загружена начиная с start_date"""
+        self._set_meta('covered_from', start_date.strftime('%Y-%m-%d'))
+        self.conn.commit()
+
+    def _read_series(self):
+        """Компактный ряд из базы; True вторым значением, если его пришлось собрать из записей по датам"""
+        row = self.conn.execute('SELECT data FROM ruonia_series WHERE id = 1').fetchone()
+        if row:
+            return RuoniaSeries.from_bytes(row[0]), False
+        # База создана до появления компактного ряда: собираем его из записей по датам
+        rows = self.conn.execute('SELECT date, rate FROM ruonia_history').fetchall()
+        return RuoniaSeries.from_history(
+            [{'date': datetime.strptime(date, '%Y-%m-%d'), 'rate': rate} for date, rate in rows]
+        ), True
+
+    def series(self):
+        """Вся сохраненная история в виде компактного ряда"""
+        if self._series is None:
+            self._series, rebuilt = self._read_series()
+            if rebuilt:
+                self._write_series()
+                self.conn.commit()
+        return self._series
+
+    def _write_series(self):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO ruonia_series (id, data) VALUES (1, ?)', (self._series.to_bytes(),)
+        )
+
+    def last_date(self):
+        """Последняя сохраненная дата"""
+        return self.series().last_date()
+
+    def add(self, history):
+        """Сохранение записей вида {'date': datetime, 'rate': float}
+
+        Ряд перечитывается из базы и дополняется под блокировкой записи:
+        другое соединение (фоновое обновление, загрузка истории) могло
+        сохранить свои дни после того, как этот экземпляр прочитал ряд.
+        """
+        self.conn.commit()
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO ruonia_history (date, rate) VALUES (?, ?)',
+                [(entry['date'].strftime('%Y-%m-%d'), entry['rate']) for entry in history]
+            )
+            stored, _ = self._read_series()
+            self._series = stored.merge(RuoniaSeries.from_history(history))
+            self._write_series()
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+
+    async def _load(self, start_date, end_date):
+        """Загрузка периода с сайта ЦБ; True, если данные получены"""
+        history = await get_ruonia_history_parametrized(start_date, end_date)
+        if history:
+            self.add(history)
+            print(f"📊 Загружено {len(history)} записей RUONIA за {start_date.strftime('%d.%m.%Y')}-{end_date.strftime('%d.%m.%Y')}")
+        return bool(history)
+
+    async def sync(self, start_date, end_date):
+        """Догрузка недостающих дней периода"""
+        start_date, end_date = start_of_day(start_date), start_of_day(end_date)
+        covered_from = self.covered_from()
+
+        # Запрошен период раньше уже загруженного
+        if covered_from is None or start_date < covered_from:
+            gap_end = covered_from - timedelta(days=1) if covered_from else end_date
+            if await self._load(start_date, gap_end):
+                self._set_meta('covered_from', start_date.strftime('%Y-%m-%d'))
+                self.conn.commit()
+            if covered_from is None:
+                return
+
+        # Новые дни после последней сохраненной даты, если следующее значение уже могли опубликовать
+        last_date = self.last_date()
+        if last_date is not None and last_date < end_date and ruonia_may_have_new(last_date):
+            await self._load(last_date + timedelta(days=1), end_date)
+
+    def get_range(self, start_date, end_date):
+        """История за период из локальной базы в виде RuoniaSeries"""
+        return self.series().slice(start_date, end_date)
+
+
+async def get_ruonia_history(start_date, end_date):
+    """История RUONIA за период (RuoniaSeries) с догрузкой только недостающих дней"""
+    store = RuoniaHistoryStore()
+    try:
+        await store.sync(start_date, end_date)
+        return store.get_range(start_date, end_date)
+    finally:
+        store.conn.close()
+
+
+async def get_ruonia_series(start_date, end_date):
+    """Вся сохраненная история RUONIA после догрузки недостающих дней периода"""
+    store = RuoniaHistoryStore()
+    try:
+        await store.sync(start_date, end_date)
+        return store.series()
+    finally:
+        store.conn.close()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Быстрое извлечение данных из страниц ЦБ без построения дерева BeautifulSoup
+
+Работает на заранее скомпилированных регулярных выражениях: из документа
+вырезается только нужный фрагмент (таблица table.data или текст страницы),
+чтение останавливается на закрывающем теге таблицы. Если разметка
+не распознана, функции возвращают None и вызывающий код переходит
+к разбору через BeautifulSoup.
+"""
+
+import html as html_lib
+import re
+
+# Класс data отдельным словом в значении атрибута: "data", "data spaced", но не "data-grid"
+DATA_TABLE_START = re.compile(
+    r'<table\b[^>]*\bclass\s*=\s*["\'](?:[^"\']*\s)?data(?=[\s"\'])[^"\']*["\'][^>]*>', re.IGNORECASE
+)
+TABLE_END = re.compile(r'</table\s*>', re.IGNORECASE)
+ROW_START = re.compile(r'<tr\b', re.IGNORECASE)
+# Содержимое ячейки td до закрывающего тега или до следующей ячейки
+CELL = re.compile(r'<td\b[^>]*>([^<]*(?:<(?!/?td\b|/tr\b)[^<]*)*)', re.IGNORECASE)
+TAG = re.compile(r'<[^>]*>')
+# Содержимое этих тегов BeautifulSoup не включает в get_text()
+HIDDEN = re.compile(r'<(script|style|template)\b[^>]*>.*?</\1\s*>|<!--.*?-->', re.IGNORECASE | re.DOTALL)
+
+
+def _decode(content):
+    if isinstance(content, bytes):
+        return content.decode('utf-8', errors='replace')
+    return content
+
+
+def _cell_text(fragment):
+    if '<' in fragment:
+        fragment = TAG.sub('', fragment)
+    if '&' in fragment:
+        fragment = html_lib.unescape(fragment)
+    return fragment.strip()
+
+
+def extract_table_rows(content):
+    """Строки первой таблицы table.data: список строк, каждая — список текстов ячеек td
+
+    Строки заголовка (только th) пропускаются. None, если таблица не найдена.
+    """
+    text = _decode(content)
+    start = DATA_TABLE_START.search(text)
+    if not start:
+        return None
+
+    end = TABLE_END.search(text, start.end())
+    table = text[start.end():end.start() if end else len(text)]
+
+    rows = []
+    for row in ROW_START.split(table)[1:]:
+        cells = [_cell_text(cell) for cell in CELL.findall(row)]
+        if cells:
+            rows.append(cells)
+    return rows
+
+
+def extract_text(content):
+    """Текст документа, как его возвращает BeautifulSoup.get_text()"""
+    text = HIDDEN.sub('', _decode(content))
+    return html_lib.unescape(TAG.sub('', text))
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Кэш HTTP-ответов ЦБ в локальной базе: TTL по источникам и условные запросы"""
+
+import time
+import storage
+
+# Записи, не обновлявшиеся дольше этого срока, удаляются
+MAX_ENTRY_AGE = 7 * 24 * 3600
+
+
+class CachedResponse:
+    """Сохраненный ответ с валидаторами ETag/Last-Modified"""
+
+    def __init__(self, body, etag, last_modified, fetched_at):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+
+    def age(self):
+        return time.time() - self.fetched_at
+
+    def conditional_headers(self):
+        """Заголовки для повторной проверки актуальности на сервере"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    """Кэш ответов по URL"""
+
+    def __init__(self, conn=None):
+        self.conn = conn or storage.connect()
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS http_cache ('
+            'url TEXT PRIMARY KEY, body BLOB NOT NULL, etag TEXT, '
+            'last_modified TEXT, fetched_at REAL NOT NULL)'
+        )
+        self.conn.commit()
+
+    def get(self, url):
+        row = self.conn.execute(
+            'SELECT body, etag, last_modified, fetched_at FROM http_cache WHERE url = ?', (url,)
+        ).fetchone()
+        return CachedResponse(*row) if row else None
+
+    def put(self, url, body, etag=None, last_modified=None):
+        now = time.time()
+        self.conn.execute(
+            'INSERT OR REPLACE INTO http_cache (url, body, etag, last_modified, fetched_at) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (url, body, etag, last_modified, now)
+        )
+        self.conn.execute('DELETE FROM http_cache WHERE fetched_at < ?', (now - MAX_ENTRY_AGE,))
+        self.conn.commit()
+
+    def touch(self, url):
+        """Продление срока жизни записи после ответа 304 Not Modified"""
+        self.conn.execute('UPDATE http_cache SET fetched_at = ? WHERE url = ?', (time.time(), url))
+        self.conn.commit()
+
+
+_cache = None
+
+
+def get_cache():
+    """Общий кэш процесса"""
+    global _cache
+    if _cache is None:
+        _cache = HttpCache()
+    return _cache
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Общие HTTP-клиенты с пулом соединений и keep-alive для запросов к ЦБ и Telegram"""
+
+import os
+import httpx
+from telegram import Bot
+from telegram.request import HTTPXRequest
+
+# Размеры пулов соединений можно настроить через переменные окружения
+HTTP_MAX_CONNECTIONS = int(os.getenv('HTTP_MAX_CONNECTIONS', '10'))
+HTTP_MAX_KEEPALIVE = int(os.getenv('HTTP_MAX_KEEPALIVE', '5'))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', '30'))
+TELEGRAM_POOL_SIZE = int(os.getenv('TELEGRAM_POOL_SIZE', '8'))
+
+# Адрес Bot API можно подменить локальным стендом (бенчмарки, тесты)
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org').rstrip('/')
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+_async_client = None
+
+
+def get_async_client():
+    """Общий асинхронный клиент; соединения переиспользуются для каждого хоста
+    (cbr.ru, www.cbr.ru, api.telegram.org) в пределах цикла событий"""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            headers=HEADERS,
+            timeout=30,
+            # Клиент идет по перенаправлениям ЦБ (http -> https, смена хоста, слэш в конце)
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+            )
+        )
+    return _async_client
+
+
+async def close_async_client():
+    """Закрытие асинхронного клиента перед завершением цикла событий"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+def create_bot(token):
+    """Бот Telegram с настраиваемым пулом соединений к api.telegram.org"""
+    return Bot(
+        token=token,
+        base_url=f'{TELEGRAM_API_URL}/bot',
+        request=HTTPXRequest(connection_pool_size=TELEGRAM_POOL_SIZE)
+    )
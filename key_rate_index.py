@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""История ключевой ставки в виде точек изменения для расчета спреда по дням"""
+
+from datetime import datetime, timedelta
+import storage
+from cbr_data import get_key_rate_history
+from meeting_calendar import cached_calendar
+from trading_calendar import key_rate_may_change, start_of_day
+
+
+class KeyRateIndex:
+    """Точки изменения ключевой ставки: даты по возрастанию и ставки, действующие с этих дат"""
+
+    def __init__(self, changes):
+        self.dates = []
+        self.rates = []
+        for date, rate in sorted(changes):
+            # Подряд идущие одинаковые ставки схлопываются в одну точку
+            if not self.rates or self.rates[-1] != rate:
+                self.dates.append(date)
+                self.rates.append(rate)
+
+    def __len__(self):
+        return len(self.dates)
+
+
+class KeyRateStore:
+    """Точки изменения ключевой ставки в локальной базе с догрузкой недостающих периодов"""
+
+    def __init__(self, conn=None):
+        self.conn = conn or storage.connect()
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS key_rate_changes ('
+            'date TEXT PRIMARY KEY, rate REAL NOT NULL)'
+        )
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS key_rate_meta ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL)'
+        )
+        self.conn.commit()
+
+    def _get_date(self, key):
+        row = self.conn.execute('SELECT value FROM key_rate_meta WHERE key = ?', (key,)).fetchone()
+        return datetime.strptime(row[0], '%Y-%m-%d') if row else None
+
+    def _set_date(self, key, value):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO key_rate_meta (key, value) VALUES (?, ?)',
+            (key, value.strftime('%Y-%m-%d'))
+        )
+
+    def index(self):
+        """Индекс по всем сохраненным точкам изменения"""
+        rows = self.conn.execute('SELECT date, rate FROM key_rate_changes').fetchall()
+        return KeyRateIndex([(datetime.strptime(date, '%Y-%m-%d'), rate) for date, rate in rows])
+
+    def add_changes(self, rows):
+        """Сохранение ставок по дням; в базу попадают только точки изменения"""
+        changes = KeyRateIndex([(entry['date'], entry['rate']) for entry in rows])
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO key_rate_changes (date, rate) VALUES (?, ?)',
+            [(date.strftime('%Y-%m-%d'), rate) for date, rate in zip(changes.dates, changes.rates)]
+        )
+        self.conn.commit()
+
+    def extend_coverage(self, start_date, last_loaded):
+        """Учет загруженного периода, если между ним и уже загруженной историей нет разрыва"""
+        covered_from, covered_to = self._get_date('covered_from'), self._get_date('covered_to')
+        if covered_from is None:
+            covered_from, covered_to = start_date, last_loaded
+        elif start_date <= covered_to + timedelta(days=1) and last_loaded >= covered_from - timedelta(days=1):
+            covered_from, covered_to = min(covered_from, start_date), max(covered_to, last_loaded)
+        else:
+            return
+        self._set_date('covered_from', covered_from)
+        self._set_date('covered_to', covered_to)
+        self.conn.commit()
+
+    async def _load(self, start_date, end_date):
+        """Загрузка периода с сайта ЦБ; последняя полученная дата или None"""
+        rows = await get_key_rate_history(start_date, end_date)
+        if not rows:
+            return None
+        self.add_changes(rows)
+        return max(entry['date'] for entry in rows)
+
+    async def sync(self, start_date, end_date):
+        """Догрузка периодов, которых еще нет в базе"""
+        start_date, end_date = start_of_day(start_date), start_of_day(end_date)
+        covered_from, covered_to = self._get_date('covered_from'), self._get_date('covered_to')
+
+        if covered_from is None:
+            last_loaded = await self._load(start_date, end_date)
+            if last_loaded:
+                self._set_date('covered_from', start_date)
+                self._set_date('covered_to', last_loaded)
+            self.conn.commit()
+            return
+
+        # Запись метаданных фиксируется до следующей загрузки: открытая транзакция держала бы
+        # блокировку базы, пока параллельная загрузка RUONIA ждет ее на другом соединении
+        if start_date < covered_from and await self._load(start_date, covered_from - timedelta(days=1)):
+            self._set_date('covered_from', start_date)
+            self.conn.commit()
+
+        # Ставка на сегодня может появиться позже, поэтому граница — последняя полученная дата.
+        # Между заседаниями ставка не меняется: новые дни не загружаются, пока решение
+        # очередного заседания не вступило в силу (внеочередное изменение придет со
+        # страницы ключевых показателей)
+        calendar = cached_calendar()
+        meeting_dates = calendar.dates if calendar else None
+        if covered_to < end_date and key_rate_may_change(covered_to, end_date, meeting_dates):
+            last_loaded = await self._load(covered_to + timedelta(days=1), end_date)
+            if last_loaded:
+                self._set_date('covered_to', last_loaded)
+        self.conn.commit()
+
+
+def _add_indicators(store, indicators):
+    """Действующая ставка из снимка ключевых показателей как точка изменения"""
+    if indicators is not None and indicators.key_rate and indicators.key_rate_date:
+        store.add_changes([{'date': indicators.key_rate_date, 'rate': indicators.key_rate}])
+
+
+async def get_key_rate_index(start_date, end_date, indicators=None):
+    """Индекс ключевой ставки, покрывающий период
+
+    Если передан снимок ключевых показателей, действующая ставка с датой
+    установления добавляется в индекс без отдельного запроса к ЦБ.
+    """
+    store = KeyRateStore()
+    try:
+        await store.sync(start_date, end_date)
+        _add_indicators(store, indicators)
+        return store.index()
+    finally:
+        store.conn.close()
+
+
+def load_key_rate_index(indicators=None):
+    """Индекс по сохраненным точкам и снимку показателей, без запросов к ЦБ"""
+    store = KeyRateStore()
+    try:
+        _add_indicators(store, indicators)
+        return store.index()
+    finally:
+        store.conn.close()
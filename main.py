@@ -1,9 +1,19 @@
 import os
-import requests
-from bs4 import BeautifulSoup
+import hmac
+import json
+import signal
+import asyncio
 import logging
+import multiprocessing
+from functools import partial
+from urllib.parse import urlsplit
 from telegram import Update
 from telegram.ext import Application, CommandHandler, ContextTypes
+import cbr_data
+from http_client import TELEGRAM_API_URL, close_async_client, create_bot
+from retry import deadline, COMMAND_DEADLINE
+from shared_cache import SharedCache
+from single_flight import SingleFlight
 
 # Enable logging
 logging.basicConfig(
@@ -15,62 +25,41 @@ logger = logging.getLogger(__name__)
 # Get bot token from environment variable
 TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN')
 
-def get_ruonia_rate():
+# Rates are reused for this many seconds before CBR is asked again
+RATES_CACHE_TTL = float(os.environ.get('RATES_CACHE_TTL', '60'))
+# Number of updates handled at the same time
+CONCURRENT_UPDATES = int(os.environ.get('CONCURRENT_UPDATES', '32'))
+
+# Webhook mode is enabled by the public URL Telegram posts updates to;
+# the server listens locally (behind a reverse proxy) in several worker processes
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL')
+WEBHOOK_PATH = urlsplit(WEBHOOK_URL or '').path or '/'
+WEBHOOK_LISTEN = os.environ.get('WEBHOOK_LISTEN', '127.0.0.1')
+WEBHOOK_PORT = int(os.environ.get('WEBHOOK_PORT', '8080'))
+WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET', '')
+WEBHOOK_WORKERS = int(os.environ.get('WEBHOOK_WORKERS', str(os.cpu_count() or 1)))
+# Larger request bodies are rejected without reading them
+WEBHOOK_MAX_BODY = 1024 * 1024
+
+# Concurrent /check requests share one in-flight fetch per rate
+rates_cache = SingleFlight(RATES_CACHE_TTL)
+
+async def get_ruonia_rate():
     """
-    Scrape RUONIA rate from CBR website
+    Get the latest RUONIA rate from the CBR dynamics page
     """
     try:
-        url = 'https://cbr.ru/hd_base/ruonia/dynamics/'
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Find the table with RUONIA rates
-        table = soup.find('table', class_='data')
-        if table:
-            # Get the first data row (most recent rate)
-            rows = table.find_all('tr')
-            if len(rows) > 1:
-                cols = rows[1].find_all('td')
-                if len(cols) >= 2:
-                    rate = cols[1].text.strip()
-                    return float(rate.replace(',', '.'))
-        
-        return None
+        return await rates_cache.get('ruonia', cbr_data.get_ruonia_rate)
     except Exception as e:
         logger.error(f"Error getting RUONIA rate: {e}")
         return None
 
-def get_key_rate():
+async def get_key_rate():
     """
-    Scrape key rate from CBR website
+    Get the current key rate from the CBR key rate page
     """
     try:
-        url = 'https://cbr.ru/hd_base/KeyRate/'
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Find the table with key rates
-        table = soup.find('table', class_='data')
-        if table:
-            # Get the first data row (most recent rate)
-            rows = table.find_all('tr')
-            if len(rows) > 1:
-                cols = rows[1].find_all('td')
-                if len(cols) >= 2:
-                    rate = cols[1].text.strip()
-                    return float(rate.replace(',', '.'))
-        
-        return None
+        return await rates_cache.get('key_rate', cbr_data.get_key_rate)
     except Exception as e:
         logger.error(f"Error getting key rate: {e}")
         return None
@@ -90,8 +79,9 @@ async def check_rates(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     """
     await update.message.reply_text('Получаю данные...')
     
-    ruonia = get_ruonia_rate()
-    key_rate = get_key_rate()
+    # The whole fetch, retries and fallback source included, fits into one command budget
+    with deadline(COMMAND_DEADLINE):
+        ruonia, key_rate = await asyncio.gather(get_ruonia_rate(), get_key_rate())
     
     if ruonia is not None and key_rate is not None:
         difference = ruonia - key_rate
@@ -107,6 +97,151 @@ async def check_rates(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     
     await update.message.reply_text(message)
 
+async def shutdown(application: Application) -> None:
+    """
+    Close the shared HTTP client when the bot stops.
+    """
+    await close_async_client()
+
+def build_application() -> Application:
+    """
+    Create the Application with command handlers registered.
+    """
+    application = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .base_url(f'{TELEGRAM_API_URL}/bot')
+        .concurrent_updates(CONCURRENT_UPDATES)
+        .post_shutdown(shutdown)
+        .build()
+    )
+    
+    # Register command handlers
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("check", check_rates))
+    return application
+
+async def read_headers(reader: asyncio.StreamReader) -> dict:
+    """
+    Read HTTP request headers up to the blank line; names are lowercased.
+    """
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1').strip()
+        if not line:
+            return headers
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+async def handle_webhook(application: Application, reader: asyncio.StreamReader,
+                         writer: asyncio.StreamWriter) -> None:
+    """
+    Accept one update posted by Telegram and put it into the application's queue.
+    """
+    try:
+        parts = (await reader.readline()).decode('latin-1').split()
+        headers = await read_headers(reader)
+        length = int(headers.get('content-length') or 0)
+        secret = headers.get('x-telegram-bot-api-secret-token', '')
+        
+        if len(parts) < 2 or parts[0] != 'POST' or urlsplit(parts[1]).path != WEBHOOK_PATH:
+            status = '404 Not Found'
+        elif WEBHOOK_SECRET and not hmac.compare_digest(secret, WEBHOOK_SECRET):
+            status = '403 Forbidden'
+        elif length > WEBHOOK_MAX_BODY:
+            status = '413 Payload Too Large'
+        else:
+            try:
+                update = Update.de_json(json.loads(await reader.readexactly(length)), application.bot)
+            except ValueError as e:
+                logger.warning(f"Malformed update: {e}")
+                status = '400 Bad Request'
+            else:
+                # Reply right away; the update is handled by the application's own workers
+                await application.update_queue.put(update)
+                status = '200 OK'
+        
+        writer.write(f'HTTP/1.1 {status}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n'.encode('latin-1'))
+        await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+        logger.warning(f"Error reading webhook request: {e}")
+    finally:
+        writer.close()
+
+async def serve_webhook(reuse_port: bool) -> None:
+    """
+    Run one webhook worker until SIGINT or SIGTERM.
+    """
+    # Workers share fetched rates, so only one of them asks CBR at a time
+    rates_cache.shared = SharedCache()
+    application = build_application()
+    
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    
+    try:
+        async with application:
+            await application.start()
+            server = await asyncio.start_server(
+                partial(handle_webhook, application), WEBHOOK_LISTEN, WEBHOOK_PORT, reuse_port=reuse_port
+            )
+            logger.info(f"Worker {os.getpid()} listening on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}")
+            async with server:
+                await stop.wait()
+            await application.stop()
+    finally:
+        await close_async_client()
+        rates_cache.shared.close()
+
+def run_worker(reuse_port: bool) -> None:
+    asyncio.run(serve_webhook(reuse_port))
+
+async def register_webhook() -> None:
+    """
+    Point Telegram at WEBHOOK_URL.
+    """
+    async with create_bot(TELEGRAM_BOT_TOKEN) as bot:
+        await bot.set_webhook(
+            WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET or None,
+            allowed_updates=Update.ALL_TYPES,
+            # Telegram accepts 1-100 simultaneous webhook connections
+            max_connections=min(100, max(40, WEBHOOK_WORKERS * CONCURRENT_UPDATES // 4)),
+        )
+    logger.info(f"Webhook set to {WEBHOOK_URL}")
+
+def run_webhook() -> None:
+    """
+    Register the webhook and serve it from WEBHOOK_WORKERS processes.
+    
+    With several workers every process binds the same port with SO_REUSEPORT
+    and the kernel spreads incoming connections between them.
+    """
+    asyncio.run(register_webhook())
+    
+    if WEBHOOK_WORKERS <= 1:
+        run_worker(reuse_port=False)
+        return
+    
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(True,), name=f'webhook-worker-{number}')
+        for number in range(WEBHOOK_WORKERS)
+    ]
+    for process in processes:
+        process.start()
+    
+    def stop_workers(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+    
+    signal.signal(signal.SIGINT, stop_workers)
+    signal.signal(signal.SIGTERM, stop_workers)
+    for process in processes:
+        process.join()
+
 def main() -> None:
     """
     Start the bot.
@@ -115,14 +250,13 @@ def main() -> None:
         logger.error("TELEGRAM_BOT_TOKEN environment variable not set")
         return
     
-    # Create the Application
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
-    
-    # Register command handlers
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("check", check_rates))
+    if WEBHOOK_URL:
+        logger.info(f"Starting bot in webhook mode with {WEBHOOK_WORKERS} worker(s)...")
+        run_webhook()
+        return
     
     # Start the bot
+    application = build_application()
     logger.info("Starting bot...")
     application.run_polling(allowed_updates=Update.ALL_TYPES)
 
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Календарь заседаний по ключевой ставке, разобранный один раз и сохраненный в локальной базе"""
+
+import hashlib
+import time
+from bisect import bisect_right
+from datetime import datetime
+import storage
+from cbr_data import fetch_page, parse_meeting_dates, timed_parse, MEETINGS_URL, MEETINGS_TTL
+
+
+class MeetingCalendar:
+    """Отсортированный список дат заседаний с поиском следующего заседания"""
+
+    def __init__(self, dates, page_hash=None, checked_at=0.0):
+        self.dates = sorted(dates)
+        self.page_hash = page_hash
+        self.checked_at = checked_at
+
+    def next_after(self, moment):
+        """Первое заседание строго после moment или None"""
+        index = bisect_right(self.dates, moment)
+        return self.dates[index] if index < len(self.dates) else None
+
+    def is_stale(self, now):
+        """Нужна ли проверка страницы: истек срок или в календаре не осталось будущих дат"""
+        return time.time() - self.checked_at >= MEETINGS_TTL or self.next_after(now) is None
+
+
+def _connect():
+    conn = storage.connect()
+    conn.execute('CREATE TABLE IF NOT EXISTS meeting_dates (date TEXT PRIMARY KEY)')
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS meeting_calendar_meta ('
+        'key TEXT PRIMARY KEY, value TEXT NOT NULL)'
+    )
+    return conn
+
+
+def load_calendar():
+    """Календарь из локальной базы или None, если он еще не загружался"""
+    conn = _connect()
+    try:
+        meta = dict(conn.execute('SELECT key, value FROM meeting_calendar_meta').fetchall())
+        if 'checked_at' not in meta:
+            return None
+        dates = [datetime.strptime(row[0], '%Y-%m-%d') for row in conn.execute('SELECT date FROM meeting_dates')]
+        return MeetingCalendar(dates, meta.get('page_hash'), float(meta['checked_at']))
+    finally:
+        conn.close()
+
+
+def save_calendar(calendar):
+    """Сохранение календаря в локальной базе"""
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute('DELETE FROM meeting_dates')
+            conn.executemany(
+                'INSERT INTO meeting_dates (date) VALUES (?)',
+                [(date.strftime('%Y-%m-%d'),) for date in calendar.dates]
+            )
+            conn.executemany(
+                'INSERT OR REPLACE INTO meeting_calendar_meta (key, value) VALUES (?, ?)',
+                [('page_hash', calendar.page_hash or ''), ('checked_at', str(calendar.checked_at))]
+            )
+    finally:
+        conn.close()
+
+
+_calendar = None
+
+
+def cached_calendar():
+    """Календарь из памяти или локальной базы, без запросов к ЦБ; None, если он еще не загружался"""
+    global _calendar
+    if _calendar is None:
+        _calendar = load_calendar()
+    return _calendar
+
+
+async def get_calendar(now=None):
+    """Актуальный календарь заседаний; страница загружается и разбирается, только если она изменилась"""
+    global _calendar
+    now = now or datetime.now()
+    cached_calendar()
+    if _calendar is not None and not _calendar.is_stale(now):
+        return _calendar
+
+    content = await fetch_page(MEETINGS_URL, 'календаря заседаний', ttl=MEETINGS_TTL)
+    if not content:
+        return _calendar
+
+    page_hash = hashlib.sha1(content).hexdigest()
+    if _calendar is not None and _calendar.page_hash == page_hash:
+        # Страница не изменилась, разбирать ее заново не нужно
+        _calendar.checked_at = time.time()
+    else:
+        _calendar = MeetingCalendar(timed_parse(parse_meeting_dates, content, MEETINGS_URL), page_hash, time.time())
+        print(f"📅 Календарь заседаний обновлен: {len(_calendar.dates)} дат")
+    save_calendar(_calendar)
+    return _calendar
+
+
+async def get_next_meeting_date():
+    """Получение даты следующего заседания по ключевой ставке"""
+    now = datetime.now()
+    calendar = await get_calendar(now)
+    next_meeting = calendar.next_after(now) if calendar else None
+
+    if next_meeting:
+        print(f"📅 Ближайшее заседание: {next_meeting.strftime('%d.%m.%Y')}")
+    else:
+        print("❌ Не найдено будущих заседаний")
+    return next_meeting
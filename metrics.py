@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Замеры времени по этапам и счетчики событий с выгрузкой в формате Prometheus и JSON"""
+
+import os
+import json
+import time
+import asyncio
+from contextlib import contextmanager
+
+# Адрес страницы метрик в режиме демона; пустой порт отключает ее
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = os.getenv('METRICS_PORT', '9108')
+
+PREFIX = 'ruonia_bot'
+
+
+class Timing:
+    """Накопленная статистика этапа: число замеров, суммарное и максимальное время в секундах"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+
+
+class Metrics:
+    """Замеры этапов и счетчики событий с метками, накапливаемые за время жизни процесса"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.timings = {}
+        self.counters = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, stage, seconds, **labels):
+        key = self._key(stage, labels)
+        timing = self.timings.get(key)
+        if timing is None:
+            timing = self.timings[key] = Timing()
+        timing.add(seconds)
+
+    def increment(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    @staticmethod
+    def _label_text(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for _, value in pairs)
+        return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+    def render_prometheus(self):
+        """Текстовый формат Prometheus 0.0.4"""
+        lines = [
+            f'# HELP {PREFIX}_stage_seconds Время выполнения этапов',
+            f'# TYPE {PREFIX}_stage_seconds summary',
+        ]
+        for (stage, labels), timing in sorted(self.timings.items()):
+            label_text = self._label_text(labels, [('stage', stage)])
+            lines.append(f'{PREFIX}_stage_seconds_sum{label_text} {timing.total:.6f}')
+            lines.append(f'{PREFIX}_stage_seconds_count{label_text} {timing.count}')
+
+        lines.append(f'# HELP {PREFIX}_stage_seconds_max Максимальное время этапа')
+        lines.append(f'# TYPE {PREFIX}_stage_seconds_max gauge')
+        for (stage, labels), timing in sorted(self.timings.items()):
+            label_text = self._label_text(labels, [('stage', stage)])
+            lines.append(f'{PREFIX}_stage_seconds_max{label_text} {timing.maximum:.6f}')
+
+        for name in sorted({name for name, _ in self.counters}):
+            lines.append(f'# TYPE {PREFIX}_{name}_total counter')
+            for (counter, labels), value in sorted(self.counters.items()):
+                if counter == name:
+                    lines.append(f'{PREFIX}_{name}_total{self._label_text(labels)} {value}')
+
+        lines.append(f'# TYPE {PREFIX}_start_time_seconds gauge')
+        lines.append(f'{PREFIX}_start_time_seconds {self.started_at:.0f}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self, **fields):
+        """Сводка для одной строки JSON: время этапов в миллисекундах и счетчики"""
+        def name_for(name, labels):
+            return name + ''.join(f'[{key}={value}]' for key, value in labels)
+
+        return dict(
+            fields,
+            elapsed_ms=round((time.time() - self.started_at) * 1000, 1),
+            stages={
+                name_for(stage, labels): {
+                    'count': timing.count,
+                    'total_ms': round(timing.total * 1000, 1),
+                    'max_ms': round(timing.maximum * 1000, 1),
+                }
+                for (stage, labels), timing in sorted(self.timings.items())
+            },
+            counters={name_for(name, labels): value for (name, labels), value in sorted(self.counters.items())},
+        )
+
+
+_metrics = Metrics()
+
+
+def get_metrics():
+    """Метрики процесса"""
+    return _metrics
+
+
+def observe(stage, seconds, **labels):
+    _metrics.observe(stage, seconds, **labels)
+
+
+def increment(name, value=1, **labels):
+    _metrics.increment(name, value, **labels)
+
+
+@contextmanager
+def timer(stage, **labels):
+    """Замер времени блока как этапа stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _metrics.observe(stage, time.perf_counter() - started, **labels)
+
+
+def print_summary(run):
+    """Строка JSON со сводкой по запуску для режима cron"""
+    print(json.dumps(_metrics.summary(run=run), ensure_ascii=False))
+
+
+async def _handle_request(reader, writer):
+    try:
+        request_line = await reader.readline()
+        # Заголовки запроса не нужны, но их нужно дочитать
+        while (await reader.readline()).strip():
+            pass
+        parts = request_line.decode('latin-1').split()
+        if len(parts) >= 2 and parts[1].split('?')[0] == '/metrics':
+            status, body = '200 OK', _metrics.render_prometheus().encode('utf-8')
+        else:
+            status, body = '404 Not Found', b'Not Found\n'
+        writer.write(
+            f'HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+            f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode('latin-1') + body
+        )
+        await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """Страница /metrics в цикле событий демона; None, если порт не задан или занят"""
+    if not port:
+        return None
+    try:
+        server = await asyncio.start_server(_handle_request, host, int(port))
+    except OSError as e:
+        # Без страницы метрик бот продолжает работу
+        print(f"⚠️ Страница метрик не запущена на {host}:{port}: {e}")
+        return None
+    print(f"📈 Метрики: http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Журнал обработанных обновлений Telegram: offset и update_id в локальной базе"""
+
+import time
+import storage
+
+# Файл, в котором offset хранился раньше; читается один раз при переносе в базу
+LEGACY_OFFSET_FILE = 'last_update_id.txt'
+# Сколько последних update_id хранить для защиты от повторной обработки
+HANDLED_KEEP = 1000
+
+
+class OffsetStore:
+    """Последний обработанный update_id и недавно обработанные обновления
+
+    update_id отмечается обработанным сразу после доставки ответа на
+    него, offset сдвигается после всей пачки. Если пачка оборвалась, она
+    будет получена заново, а уже отвеченные в ней обновления пропускаются.
+    Неудачные попытки обработать пачку считаются по ее первому update_id.
+    """
+
+    def __init__(self, conn=None):
+        self.conn = conn or storage.connect()
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS update_offset ('
+            'id INTEGER PRIMARY KEY CHECK (id = 1), last_update_id INTEGER NOT NULL)'
+        )
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS handled_updates ('
+            'update_id INTEGER PRIMARY KEY, handled_at REAL NOT NULL)'
+        )
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS batch_failures ('
+            'id INTEGER PRIMARY KEY CHECK (id = 1), first_update_id INTEGER NOT NULL, attempts INTEGER NOT NULL)'
+        )
+        self.conn.commit()
+
+    def _migrate(self):
+        """offset из last_update_id.txt, если база создана после него"""
+        try:
+            with open(LEGACY_OFFSET_FILE, 'r') as f:
+                update_id = int(f.read().strip())
+        except (FileNotFoundError, ValueError):
+            return 0
+
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR IGNORE INTO update_offset (id, last_update_id) VALUES (1, ?)', (update_id,)
+            )
+        print(f"offset {update_id} перенесен из {LEGACY_OFFSET_FILE} в {storage.DB_PATH}")
+        return update_id
+
+    def last_update_id(self):
+        """ID последнего обработанного обновления или 0"""
+        row = self.conn.execute('SELECT last_update_id FROM update_offset WHERE id = 1').fetchone()
+        return row[0] if row else self._migrate()
+
+    def unhandled(self, updates):
+        """Обновления, которые еще не обрабатывались"""
+        if not updates:
+            return []
+        ids = [update['update_id'] for update in updates]
+        placeholders = ','.join('?' * len(ids))
+        handled = {row[0] for row in self.conn.execute(
+            f'SELECT update_id FROM handled_updates WHERE update_id IN ({placeholders})', ids
+        )}
+        return [update for update in updates if update['update_id'] not in handled]
+
+    def mark_handled(self, update_ids):
+        """Отметка обновлений, ответы на которые доставлены"""
+        if not update_ids:
+            return
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO handled_updates (update_id, handled_at) VALUES (?, ?)',
+                [(update_id, now) for update_id in update_ids]
+            )
+
+    def record_failure(self, first_update_id):
+        """Учет неудачной попытки обработать пачку, начинающуюся с first_update_id; число попыток"""
+        with self.conn:
+            row = self.conn.execute('SELECT first_update_id, attempts FROM batch_failures WHERE id = 1').fetchone()
+            attempts = row[1] + 1 if row and row[0] == first_update_id else 1
+            self.conn.execute(
+                'INSERT OR REPLACE INTO batch_failures (id, first_update_id, attempts) VALUES (1, ?, ?)',
+                (first_update_id, attempts)
+            )
+        return attempts
+
+    def commit_batch(self, updates):
+        """Отметка пачки обработанной и сдвиг offset одной транзакцией"""
+        if not updates:
+            return
+        last_update_id = max(update['update_id'] for update in updates)
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO handled_updates (update_id, handled_at) VALUES (?, ?)',
+                [(update['update_id'], now) for update in updates]
+            )
+            self.conn.execute(
+                'INSERT INTO update_offset (id, last_update_id) VALUES (1, ?) '
+                'ON CONFLICT(id) DO UPDATE SET last_update_id = MAX(last_update_id, excluded.last_update_id)',
+                (last_update_id,)
+            )
+            self.conn.execute(
+                'DELETE FROM handled_updates WHERE update_id <= ?', (last_update_id - HANDLED_KEEP,)
+            )
+            self.conn.execute('DELETE FROM batch_failures')
+
+    def close(self):
+        self.conn.close()
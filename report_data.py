@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Параллельный сбор данных для /check, /prog и ежедневного отчета"""
+
+import asyncio
+from datetime import datetime, timedelta
+from cbr_data import get_key_indicators, get_ruonia_rate
+from meeting_calendar import get_next_meeting_date
+from history_store import get_ruonia_history, get_ruonia_series
+from key_rate_index import get_key_rate_index, load_key_rate_index
+from spread_aggregates import get_aggregates
+from analytics import build_spread_series
+from ruonia_series import RuoniaSeries
+from metrics import timer
+
+
+class ReportData:
+    """Данные для отчета: ставки, история RUONIA, накопленные суммы спреда и дата следующего заседания"""
+
+    def __init__(self, indicators, ruonia, history, next_meeting, today, aggregates=None):
+        self.indicators = indicators
+        self.ruonia = ruonia
+        self.history = history
+        self.next_meeting = next_meeting
+        self.today = today
+        self.aggregates = aggregates
+
+    @property
+    def key_rate(self):
+        return self.indicators.key_rate
+
+    @property
+    def key_rate_date(self):
+        return self.indicators.key_rate_date
+
+    def average_spread(self):
+        """Средний спред RUONIA к ключевой ставке с ее последнего изменения или None"""
+        if self.aggregates is None or not self.key_rate_date:
+            return None
+        return self.aggregates.average_spread_since(self.key_rate_date)
+
+    def trading_days(self):
+        """Число торговых дней с последнего изменения ключевой ставки"""
+        if self.aggregates is None or not self.key_rate_date:
+            return 0
+        return self.aggregates.trading_days_since(self.key_rate_date)
+
+
+async def collect_report_data(need_ruonia=True):
+    """Сбор данных для отчета
+
+    Календарь заседаний загружается параллельно со страницей ключевых
+    показателей, история RUONIA и запасной источник RUONIA — сразу после
+    нее, так как зависят от даты установления ключевой ставки.
+    """
+    today = datetime.now()
+    meeting_task = asyncio.ensure_future(get_next_meeting_date())
+
+    try:
+        indicators = await get_key_indicators()
+
+        async def ruonia():
+            # Если на главной нет RUONIA, берем со страницы динамики
+            if indicators.ruonia or not need_ruonia:
+                return indicators.ruonia
+            return await get_ruonia_rate()
+
+        async def history():
+            if not indicators.key_rate_date:
+                return RuoniaSeries()
+            return await get_ruonia_series(indicators.key_rate_date, today)
+
+        ruonia_rate, ruonia_series = await asyncio.gather(ruonia(), history())
+        next_meeting = await meeting_task
+    finally:
+        meeting_task.cancel()
+
+    if not indicators.key_rate_date:
+        return ReportData(indicators, ruonia_rate, ruonia_series, next_meeting, today)
+
+    # Средние с даты изменения ставки — разностью накопленных сумм по всей сохраненной истории
+    with timer('analytics', step='aggregates'):
+        aggregates = get_aggregates(ruonia_series, load_key_rate_index(indicators))
+    ruonia_history = ruonia_series.slice(indicators.key_rate_date, today)
+    return ReportData(indicators, ruonia_rate, ruonia_history, next_meeting, today, aggregates)
+
+
+async def collect_spread_window(days, today, indicators=None):
+    """История RUONIA и индекс ключевой ставки за последние days дней, загружаемые параллельно"""
+    start_date = today - timedelta(days=days)
+    return await asyncio.gather(
+        get_ruonia_history(start_date, today),
+        get_key_rate_index(start_date, today, indicators)
+    )
+
+
+async def collect_spread_series(days, today, indicators=None):
+    """Спред RUONIA к действовавшей ключевой ставке за последние days дней"""
+    ruonia_series, key_rate_index = await collect_spread_window(days, today, indicators)
+    with timer('analytics', step='spread_series'):
+        return build_spread_series(ruonia_series, key_rate_index)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Готовый снимок отчета (данные и тексты ответов) для ответа на команды без запросов к ЦБ"""
+
+import os
+import json
+import time
+import asyncio
+from datetime import datetime
+import storage
+from analytics import WINDOWS
+from report_data import collect_report_data, collect_spread_series
+from report_text import render_check, render_prog
+from retry import deadline, REPORT_DEADLINE
+from metrics import increment
+from broadcast import send_all
+from alerts import ingest as ingest_alerts
+from trading_calendar import next_change, unchanged_since
+
+# Снимок считается свежим столько секунд и только в день создания; вне окон публикации
+# ЦБ — до начала следующего окна (trading_calendar)
+SNAPSHOT_MAX_AGE = float(os.getenv('SNAPSHOT_MAX_AGE', str(30 * 60)))
+# Период обновления снимка фоновой задачей демона
+SNAPSHOT_REFRESH_INTERVAL = float(os.getenv('SNAPSHOT_REFRESH_INTERVAL', str(10 * 60)))
+# Формат снимка: увеличивается при изменении полей или текстов, старые снимки перестают использоваться
+SNAPSHOT_FORMAT = 1
+# Сколько последних версий хранить
+SNAPSHOT_KEEP = 50
+
+# Команды, ответы на которые хранятся в снимке
+SNAPSHOT_COMMANDS = ('check', 'prog')
+
+
+def _date_text(value):
+    return value.strftime('%Y-%m-%d') if value else None
+
+
+class ReportSnapshot:
+    """Версия отчета: данные ставок и готовые тексты ответов на команды"""
+
+    def __init__(self, data, texts, created_at=None, version=None, snapshot_format=SNAPSHOT_FORMAT):
+        self.data = data
+        self.texts = texts
+        self.created_at = created_at if created_at is not None else time.time()
+        self.version = version
+        self.format = snapshot_format
+
+    def __repr__(self):
+        return f"ReportSnapshot(версия {self.version}, {time.strftime('%d.%m.%Y %H:%M', time.localtime(self.created_at))})"
+
+    def age(self):
+        return time.time() - self.created_at
+
+    def is_fresh(self, now=None):
+        """Снимок текущего формата, созданный сегодня не раньше SNAPSHOT_MAX_AGE секунд назад
+        или после последнего окна публикации RUONIA и ключевой ставки"""
+        now = now or datetime.now()
+        return (self.format == SNAPSHOT_FORMAT
+                and self.data.get('today') == _date_text(now)
+                and (self.age() < SNAPSHOT_MAX_AGE or unchanged_since(self.created_at, 'ruonia', 'key_rate')))
+
+    def text(self, command):
+        return self.texts.get(command)
+
+
+def build_snapshot(report_data, series):
+    """Снимок из собранных данных; None, если данных недостаточно для полного отчета"""
+    if not report_data.ruonia or not report_data.key_rate or not report_data.key_rate_date:
+        return None
+
+    data = {
+        'today': _date_text(report_data.today),
+        'ruonia': report_data.ruonia,
+        'ruonia_date': _date_text(report_data.indicators.ruonia_date),
+        'key_rate': report_data.key_rate,
+        'key_rate_date': _date_text(report_data.key_rate_date),
+        'average_spread': report_data.average_spread(),
+        'trading_days': report_data.trading_days(),
+        'next_meeting': _date_text(report_data.next_meeting),
+    }
+    texts = {
+        'check': render_check(report_data),
+        'prog': render_prog(report_data, series),
+    }
+    return ReportSnapshot(data, texts)
+
+
+class SnapshotStore:
+    """Версии снимков в локальной базе"""
+
+    def __init__(self, conn=None):
+        self.conn = conn or storage.connect()
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS report_snapshots ('
+            'version INTEGER PRIMARY KEY AUTOINCREMENT, format INTEGER NOT NULL, '
+            'created_at REAL NOT NULL, data TEXT NOT NULL, texts TEXT NOT NULL)'
+        )
+        self.conn.commit()
+
+    def save(self, snapshot):
+        """Сохранение новой версии; возвращает ее номер"""
+        with self.conn:
+            cursor = self.conn.execute(
+                'INSERT INTO report_snapshots (format, created_at, data, texts) VALUES (?, ?, ?, ?)',
+                (snapshot.format, snapshot.created_at,
+                 json.dumps(snapshot.data, ensure_ascii=False), json.dumps(snapshot.texts, ensure_ascii=False))
+            )
+            snapshot.version = cursor.lastrowid
+            self.conn.execute('DELETE FROM report_snapshots WHERE version <= ?', (snapshot.version - SNAPSHOT_KEEP,))
+        return snapshot.version
+
+    def latest(self):
+        row = self.conn.execute(
+            'SELECT version, format, created_at, data, texts FROM report_snapshots ORDER BY version DESC LIMIT 1'
+        ).fetchone()
+        if not row:
+            return None
+        version, snapshot_format, created_at, data, texts = row
+        return ReportSnapshot(json.loads(data), json.loads(texts), created_at, version, snapshot_format)
+
+    def close(self):
+        self.conn.close()
+
+
+def _latest_snapshot():
+    store = SnapshotStore()
+    try:
+        return store.latest()
+    finally:
+        store.close()
+
+
+def load_fresh_snapshot():
+    """Последний снимок, если он свежий, иначе None"""
+    snapshot = _latest_snapshot()
+    fresh = snapshot is not None and snapshot.is_fresh()
+    increment('snapshot', result='hit' if fresh else 'miss')
+    return snapshot if fresh else None
+
+
+def save_snapshot(snapshot):
+    store = SnapshotStore()
+    try:
+        version = store.save(snapshot)
+    finally:
+        store.close()
+    print(f"🗄 Сохранен снимок отчета, версия {version}")
+    return version
+
+
+def needs_refresh():
+    """Нет свежего снимка или после последнего снимка ЦБ мог опубликовать новые данные"""
+    snapshot = _latest_snapshot()
+    return (snapshot is None or not snapshot.is_fresh()
+            or not unchanged_since(snapshot.created_at, 'ruonia', 'key_rate'))
+
+
+async def refresh_snapshot(bot):
+    """Сбор данных, рассылка сработавших оповещений и сохранение нового снимка; снимок или None"""
+    with deadline(REPORT_DEADLINE):
+        report_data = await collect_report_data()
+        series = await collect_spread_series(max(WINDOWS), report_data.today, report_data.indicators)
+    await send_all(bot, ingest_alerts(report_data))
+    snapshot = build_snapshot(report_data, series)
+    if snapshot:
+        save_snapshot(snapshot)
+    return snapshot
+
+
+async def run_refresher(stop, bot, interval=SNAPSHOT_REFRESH_INTERVAL):
+    """Фоновое обновление снимка в режиме демона до установки события stop
+
+    Пока снимок свежий (вне окон публикации ЦБ), запросов к ЦБ нет; к началу
+    очередного окна задача просыпается, не дожидаясь конца интервала.
+    """
+    while not stop.is_set():
+        if needs_refresh():
+            try:
+                await refresh_snapshot(bot)
+            except Exception as e:
+                print(f"Ошибка при обновлении снимка отчета: {e}")
+
+        # Внутри окна публикации — обычный интервал, вне его — до начала окна, но не дольше интервала
+        now = time.time()
+        until_window = next_change(now, 'ruonia', 'key_rate') - now
+        wait = min(interval, until_window) if until_window > 0 else interval
+        try:
+            await asyncio.wait_for(stop.wait(), wait)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Тексты ответов на /check и /prog"""
+
+from datetime import datetime
+from analytics import WINDOWS, compute_spread_stats, render_spread_stats
+
+
+def render_check(report_data):
+    """Текст ответа на /check"""
+    ruonia = report_data.ruonia
+    key_rate, key_rate_date = report_data.key_rate, report_data.key_rate_date
+
+    if not ruonia or not key_rate:
+        print("Не удалось получить данные после повторных попыток")
+        return "Ошибка при получении данных о ставках. Попробуйте позже."
+
+    diff = ruonia - key_rate
+    today = report_data.today
+    today_str = today.strftime('%d.%m.%Y')
+
+    # Формируем базовое сообщение
+    if diff > 0:
+        emoji = '✅'
+        comparison = 'RUONIA выше ключевой ставки.'
+    elif diff < 0:
+        emoji = '⚠️'
+        comparison = 'RUONIA ниже ключевой ставки.'
+    else:
+        emoji = '🔵'
+        comparison = 'RUONIA равна ключевой ставке.'
+
+    message_text = f"""📊 Ежедневный отчет по ставкам {today_str}:
+
+📈 RUONIA: {ruonia:.2f}%
+🏦 Ключевая ставка ЦБ: {key_rate:.2f}%
+💡 Разница сегодня: {diff:+.2f}%
+{emoji} {comparison}"""
+
+    # Добавляем статистику с последнего заседания
+    if key_rate_date:
+        avg_diff = report_data.average_spread()
+
+        if avg_diff is not None:
+            comparison_avg = "ниже" if avg_diff < 0 else "выше"
+            days_count = report_data.trading_days()
+
+            message_text += f"""
+
+📅 Статистика с {key_rate_date.strftime('%d.%m.%Y')}:
+📊 Средняя разница: {abs(avg_diff):.2f}% {comparison_avg}
+📆 Торговых дней: {days_count}"""
+
+    # Добавляем дату следующего заседания
+    next_meeting = report_data.next_meeting
+    if next_meeting:
+        days_until = (next_meeting - today).days
+        message_text += f"""
+
+🗓 Следующее заседание: {next_meeting.strftime('%d.%m.%Y')}
+⏳ Осталось дней: {days_until}"""
+
+    return message_text
+
+
+def render_prog_window(days, series, today):
+    """Текст ответа на /prog <дней>: спред к ставке, действовавшей в каждый день окна"""
+    end_day = today.toordinal()
+    window = series.since(end_day - days)
+
+    if len(window) == 0:
+        return "Не удалось получить историю ставок за этот период. Попробуйте позже."
+
+    avg_diff = float(window.spreads.mean())
+    comparison = "ниже" if avg_diff < 0 else "выше"
+    start_date = datetime.fromordinal(int(window.days[0]))
+    end_date = datetime.fromordinal(int(window.days[-1]))
+
+    message_text = f"""📊 Статистика за {days} дн.:
+
+С {start_date.strftime('%d.%m.%Y')} по {end_date.strftime('%d.%m.%Y')} ставка RUONIA была в среднем на {abs(avg_diff):.2f}% {comparison}, чем ключевая ставка, действовавшая в каждый из дней.
+
+Количество торговых дней в анализе: {len(window)}"""
+
+    stats = compute_spread_stats(window, end_day, tuple(w for w in WINDOWS if w < days) + (days,))
+    if stats:
+        message_text += "\n\n" + render_spread_stats(window, stats)
+    return message_text
+
+
+def render_prog(report_data, series=None):
+    """Текст ответа на /prog"""
+    current_key_rate, last_change_date = report_data.key_rate, report_data.key_rate_date
+
+    if not current_key_rate or not last_change_date:
+        return "Не удалось получить данные о ключевой ставке."
+
+    # История RUONIA с момента последнего изменения
+    today = report_data.today
+
+    if not report_data.history:
+        return "Не удалось получить историю RUONIA. Попробуйте позже."
+
+    # Средняя разница по накопленным суммам
+    avg_diff = report_data.average_spread()
+
+    if avg_diff is None:
+        return "Не удалось рассчитать прогноз. Попробуйте позже."
+
+    # Форматируем сообщение
+    comparison = "ниже" if avg_diff < 0 else "выше"
+
+    message_text = f"""📊 Прогноз и статистика:
+
+С последнего изменения ключевой ставки от {last_change_date.strftime('%d.%m.%Y')} до {today.strftime('%d.%m.%Y')} ставка RUONIA была в среднем на {abs(avg_diff):.2f}% {comparison}, чем ключевая ставка.
+
+Количество торговых дней в анализе: {report_data.trading_days()}"""
+
+    next_meeting = report_data.next_meeting
+    if next_meeting:
+        days_until = (next_meeting - today).days
+        message_text += f"\n\nСледующее заседание по ключевой ставке: {next_meeting.strftime('%d.%m.%Y')}"
+        message_text += f"\nОсталось дней до заседания: {days_until}"
+
+    # Статистика спреда по окнам от месяца до пяти лет
+    if series is not None:
+        stats = compute_spread_stats(series, today.toordinal())
+        if stats:
+            message_text += "\n\n" + render_spread_stats(series, stats)
+
+    return message_text
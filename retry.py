@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Общая политика повторных попыток: экспоненциальная задержка, бюджет команды, автомат отключения"""
+
+import asyncio
+import contextvars
+import os
+import random
+import time
+from contextlib import contextmanager
+from metrics import increment
+
+# Бюджет времени на ответ команде и на ежедневный отчет, в секундах
+COMMAND_DEADLINE = float(os.getenv('COMMAND_DEADLINE', '10'))
+REPORT_DEADLINE = float(os.getenv('REPORT_DEADLINE', '120'))
+
+
+class DeadlineExceeded(Exception):
+    """Бюджет времени команды исчерпан"""
+
+
+class CircuitOpenError(Exception):
+    """Запросы к хосту временно отключены после серии ошибок"""
+
+
+class RetryPolicy:
+    """Экспоненциальная задержка с полным джиттером между попытками"""
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=8.0, timeout=30.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+
+    def backoff(self, attempt):
+        """Задержка перед попыткой attempt + 1"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """Автомат отключения: после failure_threshold ошибок подряд хост
+    пропускается reset_timeout секунд, затем разрешается пробный запрос"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+
+    def allow(self):
+        if self.opened_at is None:
+            return True
+        # Полуоткрытое состояние: пропускаем пробный запрос
+        return time.monotonic() - self.opened_at >= self.reset_timeout
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class Deadline:
+    """Момент, к которому команда должна ответить"""
+
+    def __init__(self, seconds):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+
+DEFAULT_POLICY = RetryPolicy()
+
+_breakers = {}
+_current_deadline = contextvars.ContextVar('deadline', default=None)
+
+
+def get_breaker(key):
+    """Автомат отключения для источника (хост или хост с путем)"""
+    if key not in _breakers:
+        _breakers[key] = CircuitBreaker()
+    return _breakers[key]
+
+
+@contextmanager
+def deadline(seconds):
+    """Ограничение времени для всех запросов внутри блока, включая созданные в нем задачи"""
+    token = _current_deadline.set(Deadline(seconds))
+    try:
+        yield
+    finally:
+        _current_deadline.reset(token)
+
+
+def current_deadline():
+    return _current_deadline.get()
+
+
+async def retry_call(func, host, description, policy=DEFAULT_POLICY, breaker_key=None):
+    """Вызов func(timeout) с повторными попытками в рамках бюджета команды
+
+    Автомат отключения общий для breaker_key (по умолчанию — для хоста):
+    отказ одного сервиса на хосте не отключает другие.
+    """
+    breaker = get_breaker(breaker_key or host)
+    budget = current_deadline()
+
+    for attempt in range(1, policy.max_attempts + 1):
+        if not breaker.allow():
+            increment('circuit_open', host=host)
+            raise CircuitOpenError(f"{host} временно недоступен")
+
+        timeout = policy.timeout
+        if budget is not None:
+            timeout = min(timeout, budget.remaining())
+            if timeout <= 0:
+                increment('deadline_exceeded', host=host)
+                raise DeadlineExceeded(f"не хватило времени на {description}")
+
+        try:
+            result = await asyncio.wait_for(func(timeout), timeout)
+            breaker.record_success()
+            return result
+
+        except Exception as e:
+            breaker.record_failure()
+            print(f"Ошибка при получении {description} (попытка {attempt}/{policy.max_attempts}): {e}")
+            if attempt == policy.max_attempts:
+                increment('request_failures', host=host)
+                raise
+
+            delay = policy.backoff(attempt)
+            if budget is not None and delay >= budget.remaining():
+                increment('deadline_exceeded', host=host)
+                raise DeadlineExceeded(f"не хватило времени на {description}") from e
+            print(f"Повторная попытка через {delay:.1f} секунд...")
+            increment('retries', host=host)
+            await asyncio.sleep(delay)
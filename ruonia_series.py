@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Компактное представление истории RUONIA на массивах NumPy"""
+
+from datetime import datetime
+import numpy as np
+
+# Заголовок сериализованного ряда: число записей
+_HEADER = np.dtype('<u4')
+_DAYS = np.dtype('<i4')
+_RATES = np.dtype('<i4')
+
+
+class RuoniaSeries:
+    """История RUONIA: дни как порядковые номера дат (int32) и ставки в базисных пунктах (int32)
+
+    Даты идут по возрастанию. Срезы по датам возвращают представления
+    без копирования массивов.
+    """
+
+    def __init__(self, days=None, rates_bp=None):
+        self.days = np.asarray(days if days is not None else [], dtype=np.int32)
+        self.rates_bp = np.asarray(rates_bp if rates_bp is not None else [], dtype=np.int32)
+
+    @classmethod
+    def from_history(cls, history):
+        """Ряд из списка {'date': datetime, 'rate': float} в любом порядке"""
+        history = sorted(history, key=lambda entry: entry['date'])
+        days = np.fromiter((entry['date'].toordinal() for entry in history), dtype=np.int32, count=len(history))
+        rates = np.fromiter((entry['rate'] for entry in history), dtype=np.float64, count=len(history))
+        return cls(days, np.rint(rates * 100).astype(np.int32))
+
+    def __len__(self):
+        return len(self.days)
+
+    def __repr__(self):
+        if not len(self):
+            return "RuoniaSeries([])"
+        return f"RuoniaSeries({len(self)} дн., {self.first_date():%d.%m.%Y}-{self.last_date():%d.%m.%Y})"
+
+    @property
+    def rates(self):
+        """Ставки в процентах"""
+        return self.rates_bp / 100.0
+
+    def first_date(self):
+        return datetime.fromordinal(int(self.days[0])) if len(self) else None
+
+    def last_date(self):
+        return datetime.fromordinal(int(self.days[-1])) if len(self) else None
+
+    def slice(self, start_date, end_date):
+        """Представление ряда за период включительно"""
+        start = np.searchsorted(self.days, start_date.toordinal(), side='left')
+        end = np.searchsorted(self.days, end_date.toordinal(), side='right')
+        return RuoniaSeries(self.days[start:end], self.rates_bp[start:end])
+
+    def merge(self, other):
+        """Новый ряд с записями обоих; при совпадении дат берется значение other"""
+        days = np.concatenate((other.days, self.days))
+        rates = np.concatenate((other.rates_bp, self.rates_bp))
+        # np.unique оставляет первое вхождение каждой даты, то есть из other
+        days, first = np.unique(days, return_index=True)
+        return RuoniaSeries(days, rates[first])
+
+    def to_bytes(self):
+        """Сериализация: число записей, затем массивы дней и ставок"""
+        return (np.array([len(self)], dtype=_HEADER).tobytes()
+                + self.days.astype(_DAYS).tobytes()
+                + self.rates_bp.astype(_RATES).tobytes())
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Восстановление ряда без разбора по записям"""
+        count = int(np.frombuffer(data, dtype=_HEADER, count=1)[0])
+        offset = _HEADER.itemsize
+        days = np.frombuffer(data, dtype=_DAYS, count=count, offset=offset)
+        rates_bp = np.frombuffer(data, dtype=_RATES, count=count, offset=offset + count * _DAYS.itemsize)
+        return cls(days, rates_bp)
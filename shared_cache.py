@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Значения со сроком жизни в локальной базе, общие для нескольких процессов бота"""
+
+import os
+import json
+import time
+import storage
+
+
+class SharedCache:
+    """Значения по ключам со сроком жизни и аренда загрузки ключа
+
+    Аренду держит один процесс: остальные ждут, пока он сохранит
+    значение, и не обращаются к ЦБ сами. Аренда истекает сама, если
+    процесс-владелец завершился, не сняв ее.
+    """
+
+    def __init__(self, conn=None):
+        self.conn = conn or storage.connect()
+        self.owner = str(os.getpid())
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS shared_cache ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS shared_cache_leases ('
+            'key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+        self.conn.commit()
+
+    def get(self, key):
+        """Значение, если срок его жизни не истек, иначе None"""
+        row = self.conn.execute(
+            'SELECT value FROM shared_cache WHERE key = ? AND expires_at > ?', (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, value, ttl):
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO shared_cache (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value, ensure_ascii=False), time.time() + ttl)
+            )
+
+    def acquire(self, key, lease):
+        """Аренда загрузки ключа на lease секунд; False, если ее держит другой процесс"""
+        now = time.time()
+        with self.conn:
+            self.conn.execute('DELETE FROM shared_cache_leases WHERE key = ? AND expires_at <= ?', (key, now))
+            cursor = self.conn.execute(
+                'INSERT OR IGNORE INTO shared_cache_leases (key, owner, expires_at) VALUES (?, ?, ?)',
+                (key, self.owner, now + lease)
+            )
+        return cursor.rowcount > 0
+
+    def release(self, key):
+        with self.conn:
+            self.conn.execute('DELETE FROM shared_cache_leases WHERE key = ? AND owner = ?', (key, self.owner))
+
+    def close(self):
+        self.conn.close()
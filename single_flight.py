@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Кэш с ограниченным сроком жизни и объединением одновременных загрузок одного ключа"""
+
+import asyncio
+import time
+
+# Сколько секунд процесс может держать аренду загрузки в общем кэше
+SHARED_LEASE = 30
+# Как часто процесс, ожидающий чужую загрузку, проверяет общий кэш
+SHARED_POLL_INTERVAL = 0.1
+
+
+class SingleFlight:
+    """Значения по ключам на ttl секунд; одновременные запросы ключа ждут одну общую загрузку
+
+    Пустой результат (None) не кэшируется, чтобы сбой источника не
+    закреплялся на весь срок жизни записи. С общим кэшем shared
+    (SharedCache) загрузка объединяется и между процессами.
+    """
+
+    def __init__(self, ttl, shared=None):
+        self.ttl = ttl
+        self.shared = shared
+        self._values = {}
+        self._in_flight = {}
+
+    def peek(self, key):
+        """Значение из кэша, если оно не устарело, иначе None"""
+        cached = self._values.get(key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        return None
+
+    async def _load_shared(self, key, loader):
+        """Значение из общего кэша, загрузка под арендой или ожидание загрузки другого процесса"""
+        value = self.shared.get(key)
+        while value is None and not self.shared.acquire(key, SHARED_LEASE):
+            await asyncio.sleep(SHARED_POLL_INTERVAL)
+            value = self.shared.get(key)
+        if value is not None:
+            return value
+
+        try:
+            value = await loader()
+            if value is not None:
+                self.shared.put(key, value, self.ttl)
+            return value
+        finally:
+            self.shared.release(key)
+
+    async def _load(self, key, loader):
+        try:
+            value = await (self._load_shared(key, loader) if self.shared else loader())
+            if value is not None:
+                self._values[key] = (time.monotonic() + self.ttl, value)
+            return value
+        finally:
+            self._in_flight.pop(key, None)
+
+    async def get(self, key, loader):
+        """Значение ключа: из кэша, из уже идущей загрузки или новой загрузкой loader()"""
+        value = self.peek(key)
+        if value is not None:
+            return value
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = self._in_flight[key] = asyncio.ensure_future(self._load(key, loader))
+        # Отмена одного ожидающего не отменяет общую загрузку
+        return await asyncio.shield(task)
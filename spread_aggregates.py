@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Накопленные суммы спреда RUONIA к ключевой ставке для расчета средних с любой даты за O(1)"""
+
+import numpy as np
+
+_INITIAL_CAPACITY = 1024
+
+
+class SpreadAggregates:
+    """Префиксные суммы спреда RUONIA к действовавшей ключевой ставке, в базисных пунктах
+
+    prefix[i] — сумма по первым i торговым дням, поэтому среднее с любого
+    дня считается как разность двух сумм. Новые дни дописываются в конец
+    за O(1) без пересчета.
+    """
+
+    def __init__(self, change_days, change_rates_bp, capacity=_INITIAL_CAPACITY):
+        self.change_days = np.asarray(change_days, dtype=np.int32)
+        self.change_rates_bp = np.asarray(change_rates_bp, dtype=np.int64)
+        self.count = 0
+        self._days = np.empty(capacity, dtype=np.int32)
+        self._spread_prefix = np.zeros(capacity + 1, dtype=np.int64)
+
+    @classmethod
+    def build(cls, ruonia_series, key_rate_index):
+        """Агрегаты по всему ряду за один векторный проход"""
+        change_days = np.fromiter((date.toordinal() for date in key_rate_index.dates), dtype=np.int32, count=len(key_rate_index))
+        change_rates_bp = np.rint(np.asarray(key_rate_index.rates, dtype=np.float64) * 100).astype(np.int64)
+
+        # Дни до первой известной ставки в агрегаты не входят
+        regimes = np.searchsorted(change_days, ruonia_series.days, side='right') - 1
+        known = regimes >= 0
+        days = ruonia_series.days[known]
+        ruonia_bp = ruonia_series.rates_bp[known].astype(np.int64)
+        regimes = regimes[known]
+
+        aggregates = cls(change_days, change_rates_bp, capacity=max(_INITIAL_CAPACITY, 2 * len(days)))
+        count = len(days)
+        aggregates.count = count
+        aggregates._days[:count] = days
+        np.cumsum(ruonia_bp - change_rates_bp[regimes], out=aggregates._spread_prefix[1:count + 1])
+        return aggregates
+
+    @property
+    def days(self):
+        return self._days[:self.count]
+
+    def last_day(self):
+        return int(self._days[self.count - 1]) if self.count else None
+
+    def _grow(self):
+        capacity = 2 * len(self._days)
+        days = np.empty(capacity, dtype=np.int32)
+        days[:self.count] = self.days
+        self._days = days
+        prefix = np.zeros(capacity + 1, dtype=np.int64)
+        prefix[:self.count + 1] = self._spread_prefix[:self.count + 1]
+        self._spread_prefix = prefix
+
+    def append(self, day, rate_bp):
+        """Новая публикация RUONIA после последнего дня ряда"""
+        regime = int(np.searchsorted(self.change_days, day, side='right')) - 1
+        if regime < 0:
+            return
+        if self.count == len(self._days):
+            self._grow()
+
+        count = self.count
+        self._days[count] = day
+        self._spread_prefix[count + 1] = self._spread_prefix[count] + rate_bp - self.change_rates_bp[regime]
+        self.count = count + 1
+
+    def _position(self, date):
+        return int(np.searchsorted(self.days, date.toordinal(), side='left'))
+
+    def trading_days_since(self, date):
+        """Число торговых дней начиная с даты date"""
+        return self.count - self._position(date)
+
+    def average_spread_since(self, date):
+        """Средний спред RUONIA к действовавшей ключевой ставке с даты date, в процентах"""
+        position = self._position(date)
+        days = self.count - position
+        if days <= 0:
+            return None
+        return (self._spread_prefix[self.count] - self._spread_prefix[position]) / days / 100.0
+
+
+_aggregates = None
+
+
+def get_aggregates(ruonia_series, key_rate_index):
+    """Агрегаты для ряда с переиспользованием между вызовами в одном процессе
+
+    Если ряд только дополнился новыми днями в конце, а точки изменения
+    ключевой ставки те же, новые дни дописываются за O(1) каждый;
+    иначе агрегаты строятся заново.
+    """
+    global _aggregates
+    change_days = [date.toordinal() for date in key_rate_index.dates]
+    cached = _aggregates
+    reusable = (
+        cached is not None
+        and cached.count
+        and list(cached.change_days) == change_days
+        and np.array_equal(cached.change_rates_bp, np.rint(np.asarray(key_rate_index.rates) * 100))
+    )
+
+    if reusable:
+        last = int(np.searchsorted(ruonia_series.days, cached.last_day(), side='left'))
+        first_known = int(np.searchsorted(ruonia_series.days, cached.change_days[0], side='left'))
+        # Префикс ряда не изменился: последний учтенный день на месте и перед ним не появилось новых дней
+        if (last < len(ruonia_series) and ruonia_series.days[last] == cached.last_day()
+                and last + 1 - first_known == cached.count):
+            for day, rate_bp in zip(ruonia_series.days[last + 1:], ruonia_series.rates_bp[last + 1:]):
+                cached.append(int(day), int(rate_bp))
+            return cached
+
+    _aggregates = SpreadAggregates.build(ruonia_series, key_rate_index)
+    return _aggregates
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Локальная база SQLite для данных бота, сохраняемая между запусками"""
+
+import os
+import sqlite3
+
+# Путь к базе можно переопределить через переменную окружения
+DB_PATH = os.getenv('BOT_DB_PATH', 'bot_data.db')
+
+
+def connect(path=None):
+    """Открытие соединения с локальной базой"""
+    conn = sqlite3.connect(path or DB_PATH, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    return conn
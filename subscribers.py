@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Подписчики ежедневного отчета и статус доставки рассылок"""
+
+import time
+import storage
+
+
+class SubscriberStore:
+    """Чаты, подписанные на ежедневный отчет, и результаты доставки по каждому чату"""
+
+    def __init__(self, conn=None):
+        self.conn = conn or storage.connect()
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS subscribers ('
+            'chat_id INTEGER PRIMARY KEY, subscribed_at REAL NOT NULL, active INTEGER NOT NULL DEFAULT 1)'
+        )
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS deliveries ('
+            'broadcast_id TEXT NOT NULL, chat_id INTEGER NOT NULL, status TEXT NOT NULL, '
+            'attempts INTEGER NOT NULL, error TEXT, updated_at REAL NOT NULL, '
+            'PRIMARY KEY (broadcast_id, chat_id))'
+        )
+        self.conn.commit()
+
+    def subscribe(self, chat_id):
+        """Подписка чата; False, если он уже подписан"""
+        row = self.conn.execute('SELECT active FROM subscribers WHERE chat_id = ?', (chat_id,)).fetchone()
+        if row and row[0]:
+            return False
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO subscribers (chat_id, subscribed_at, active) VALUES (?, ?, 1)',
+                (chat_id, time.time())
+            )
+        return True
+
+    def unsubscribe(self, chat_id):
+        """Отписка чата; False, если он не был подписан"""
+        with self.conn:
+            cursor = self.conn.execute(
+                'UPDATE subscribers SET active = 0 WHERE chat_id = ? AND active = 1', (chat_id,)
+            )
+        return cursor.rowcount > 0
+
+    def active_chat_ids(self):
+        return [row[0] for row in self.conn.execute(
+            'SELECT chat_id FROM subscribers WHERE active = 1 ORDER BY subscribed_at'
+        )]
+
+    def record_deliveries(self, broadcast_id, results):
+        """Сохранение статусов доставки одной транзакцией; чаты, заблокировавшие бота, отписываются"""
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO deliveries (broadcast_id, chat_id, status, attempts, error, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(broadcast_id, result.chat_id, result.status, result.attempts, result.error, now) for result in results]
+            )
+            self.conn.executemany(
+                'UPDATE subscribers SET active = 0 WHERE chat_id = ?',
+                [(result.chat_id,) for result in results if result.status == 'blocked']
+            )
+
+    def delivered(self, broadcast_id):
+        """Была ли уже рассылка broadcast_id, хотя бы в один чат"""
+        return self.conn.execute(
+            'SELECT 1 FROM deliveries WHERE broadcast_id = ? LIMIT 1', (broadcast_id,)
+        ).fetchone() is not None
+
+    def close(self):
+        self.conn.close()
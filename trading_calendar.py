@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Рабочие дни и окна публикации данных ЦБ: когда RUONIA и ключевая ставка могут измениться"""
+
+import os
+import time
+from datetime import datetime, date, time as day_time, timedelta, timezone
+
+MSK = timezone(timedelta(hours=3))
+
+# Не дольше этого срока данные считаются неизменными без обращения к ЦБ, даже если
+# по расписанию публикаций ничего не ожидается; 0 отключает расписание
+FRESHNESS_MAX_AGE = float(os.getenv('FRESHNESS_MAX_AGE', str(24 * 3600)))
+
+# Окна публикации по московскому времени в рабочие дни: решение по ключевой ставке
+# объявляется в 13:30, RUONIA за предыдущий рабочий день публикуется после 14:00.
+# Вне окон данные на сайте ЦБ не меняются
+PUBLICATION_WINDOWS = {
+    'key_rate': (day_time(13, 30), day_time(19, 0)),
+    'ruonia': (day_time(14, 0), day_time(19, 0)),
+}
+
+# Нерабочие праздничные дни (ст. 112 ТК РФ)
+FIXED_HOLIDAYS = {
+    (1, 1), (1, 2), (1, 3), (1, 4), (1, 5), (1, 6), (1, 7), (1, 8),
+    (2, 23), (3, 8), (5, 1), (5, 9), (6, 12), (11, 4),
+}
+# Переносы выходных по постановлениям Правительства: дополнительные нерабочие дни
+# и рабочие субботы. Для других лет праздник, совпавший с выходным, переносится
+# на следующий рабочий день (кроме новогодних)
+TRANSFERRED_HOLIDAYS = {
+    2024: ['2024-04-29', '2024-04-30', '2024-05-10', '2024-12-30', '2024-12-31'],
+    2025: ['2025-05-02', '2025-05-08', '2025-06-13', '2025-11-03', '2025-12-31'],
+    2026: ['2026-01-09', '2026-03-09', '2026-05-11', '2026-12-31'],
+}
+WORKING_WEEKENDS = {
+    2024: ['2024-04-27', '2024-11-02', '2024-12-28'],
+    2025: ['2025-11-01'],
+    2026: [],
+}
+
+
+def _parse_days(days):
+    return {datetime.strptime(day, '%Y-%m-%d').date() for day in days}
+
+
+def _year_holidays(year):
+    """Нерабочие дни года сверх суббот и воскресений"""
+    holidays = {date(year, month, day) for month, day in FIXED_HOLIDAYS}
+    if year in TRANSFERRED_HOLIDAYS:
+        return holidays | _parse_days(TRANSFERRED_HOLIDAYS[year])
+
+    for holiday in sorted(holidays):
+        if holiday.weekday() >= 5 and holiday.month != 1:
+            moved = holiday + timedelta(days=1)
+            while moved.weekday() >= 5 or moved in holidays:
+                moved += timedelta(days=1)
+            holidays.add(moved)
+    return holidays
+
+
+_holidays = {}
+_working_weekends = {year: _parse_days(days) for year, days in WORKING_WEEKENDS.items()}
+
+
+def _day(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def start_of_day(value):
+    """Приведение datetime к началу дня"""
+    return datetime(value.year, value.month, value.day)
+
+
+def is_business_day(value):
+    """Рабочий ли день по производственному календарю"""
+    day = _day(value)
+    holidays = _holidays.get(day.year)
+    if holidays is None:
+        holidays = _holidays[day.year] = _year_holidays(day.year)
+    if day in _working_weekends.get(day.year, ()):
+        return True
+    return day.weekday() < 5 and day not in holidays
+
+
+def next_business_day(value):
+    """Первый рабочий день строго после value"""
+    day = _day(value) + timedelta(days=1)
+    while not is_business_day(day):
+        day += timedelta(days=1)
+    return day
+
+
+def _window(day, series):
+    start, end = PUBLICATION_WINDOWS[series]
+    return datetime.combine(day, start, MSK).timestamp(), datetime.combine(day, end, MSK).timestamp()
+
+
+def last_change(now, *series):
+    """Момент (timestamp), позже которого данные series до now не менялись
+
+    Внутри окна публикации это сам момент now: новое значение может
+    появиться в любую минуту.
+    """
+    latest = 0.0
+    for name in series:
+        day = datetime.fromtimestamp(now, MSK).date()
+        while True:
+            if is_business_day(day):
+                start, end = _window(day, name)
+                if now >= end:
+                    latest = max(latest, end)
+                    break
+                if now >= start:
+                    return now
+            day -= timedelta(days=1)
+    return latest
+
+
+def next_change(now, *series):
+    """Ближайший момент (timestamp), когда данные series могут измениться"""
+    earliest = None
+    for name in series:
+        day = datetime.fromtimestamp(now, MSK).date()
+        while True:
+            if is_business_day(day):
+                start, end = _window(day, name)
+                if now < end:
+                    moment = max(now, start)
+                    break
+            day += timedelta(days=1)
+        earliest = moment if earliest is None else min(earliest, moment)
+    return earliest
+
+
+def freshness_ttl(ttl, *series, now=None):
+    """Срок в секундах, в течение которого сохраненная копия series не требует проверки на сервере
+
+    Не меньше ttl; вне окон публикации — до последнего момента, когда
+    данные могли измениться, но не больше FRESHNESS_MAX_AGE.
+    """
+    if FRESHNESS_MAX_AGE <= 0:
+        return ttl
+    now = now or time.time()
+    return max(ttl, min(now - last_change(now, *series), FRESHNESS_MAX_AGE))
+
+
+def unchanged_since(moment, *series, now=None):
+    """Не могли ли данные series измениться после момента moment (timestamp)"""
+    if FRESHNESS_MAX_AGE <= 0:
+        return False
+    now = now or time.time()
+    return now - moment < FRESHNESS_MAX_AGE and moment >= last_change(now, *series)
+
+
+def ruonia_publication(last_value_date):
+    """Момент (timestamp) публикации первого значения RUONIA после даты last_value_date
+
+    Значение за рабочий день публикуется в следующий рабочий день.
+    """
+    value_day = next_business_day(last_value_date)
+    return _window(next_business_day(value_day), 'ruonia')[0]
+
+
+def ruonia_may_have_new(last_value_date, now=None):
+    """Могли ли после last_value_date уже опубликовать новые значения RUONIA"""
+    if FRESHNESS_MAX_AGE <= 0:
+        return True
+    return (now or time.time()) >= ruonia_publication(last_value_date)
+
+
+def key_rate_may_change(since, until, meeting_dates):
+    """Могла ли ключевая ставка измениться в днях после since по until включительно
+
+    Решение вступает в силу в рабочий день после заседания. Без календаря
+    заседаний (meeting_dates is None) изменение считается возможным.
+    """
+    if FRESHNESS_MAX_AGE <= 0 or meeting_dates is None:
+        return True
+    since, until = _day(since), _day(until)
+    for meeting in meeting_dates:
+        effective = next_business_day(meeting)
+        if since < effective <= until:
+            return True
+    return False